@@ -1,21 +1,41 @@
 """Support for Nexia / Trane XL Thermostats."""
 import asyncio
-from datetime import timedelta
-from functools import partial
 import logging
 
+from aiohttp import ClientError, ClientResponseError
+from nexia.const import ROOT_URL
 from nexia.home import NexiaHome
-from requests.exceptions import ConnectTimeout, HTTPError
 import voluptuous as vol
 
 from homeassistant.config_entries import SOURCE_IMPORT, ConfigEntry
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
-
-from .const import DOMAIN, NEXIA_DEVICE, PLATFORMS, UPDATE_COORDINATOR
+from homeassistant.helpers.storage import Store
+
+from .api import NexiaApi, NexiaLoginError, session_store
+from .commands import NexiaPendingCommands
+from .const import (
+    CONF_GRACE_FAILED_POLLS,
+    CONF_GRACE_SECONDS,
+    DEFAULT_GRACE_FAILED_POLLS,
+    DEFAULT_GRACE_SECONDS,
+    DEVICE_INDEX,
+    DOMAIN,
+    NEXIA_API,
+    NEXIA_DEVICE,
+    PENDING_COMMANDS,
+    PLATFORMS,
+    RUNTIME_TRACKER,
+    SERVICE_BULK_SET,
+    STORAGE_VERSION,
+    UPDATE_COORDINATOR,
+    UPDATE_LISTENER,
+)
+from .coordinator import NexiaDataUpdateCoordinator
+from .device_index import NexiaDeviceIndex
+from .runtime import NexiaRuntimeTracker
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -26,6 +46,7 @@ CONFIG_SCHEMA = vol.Schema(
             {
                 vol.Required(CONF_USERNAME): cv.string,
                 vol.Required(CONF_PASSWORD): cv.string,
+                vol.Optional(CONF_URL): cv.url,
             },
             extra=vol.ALLOW_EXTRA,
         ),
@@ -33,8 +54,6 @@ CONFIG_SCHEMA = vol.Schema(
     extra=vol.ALLOW_EXTRA,
 )
 
-DEFAULT_UPDATE_RATE = 120
-
 
 async def async_setup(hass: HomeAssistant, config: dict) -> bool:
     """Set up the nexia component from YAML."""
@@ -60,43 +79,74 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     username = conf[CONF_USERNAME]
     password = conf[CONF_PASSWORD]
 
-    try:
-        nexia_home = await hass.async_add_executor_job(
-            partial(
-                NexiaHome,
-                username=username,
-                password=password,
-                device_name=hass.config.location_name,
-            )
-        )
-    except ConnectTimeout as ex:
-        _LOGGER.error("Unable to connect to Nexia service: %s", ex)
-        raise ConfigEntryNotReady
-    except HTTPError as http_ex:
-        if http_ex.response.status_code >= 400 and http_ex.response.status_code < 500:
+    nexia_home = NexiaHome(
+        username=username,
+        password=password,
+        auto_login=False,
+        auto_update=False,
+        device_name=hass.config.location_name,
+    )
+    api = NexiaApi(hass, nexia_home, conf.get(CONF_URL, ROOT_URL))
+    coordinator = NexiaDataUpdateCoordinator(
+        hass,
+        api,
+        _async_get_store(hass, entry),
+        entry.options.get(CONF_GRACE_FAILED_POLLS, DEFAULT_GRACE_FAILED_POLLS),
+        entry.options.get(CONF_GRACE_SECONDS, DEFAULT_GRACE_SECONDS),
+    )
+
+    if await coordinator.async_load_cache():
+        # Start from the stored house and log in and refresh in the background
+        coordinator.async_refresh_in_background()
+    else:
+        try:
+            await api.async_ensure_login()
+            await api.async_update()
+        except NexiaLoginError as ex:
+            await api.async_close()
             _LOGGER.error(
-                "Access error from Nexia service, please check credentials: %s",
-                http_ex,
+                "Access error from Nexia service, please check credentials: %s", ex
             )
             return False
-        _LOGGER.error("HTTP error from Nexia service: %s", http_ex)
-        raise ConfigEntryNotReady
-
-    async def _async_update_data():
-        """Fetch data from API endpoint."""
-        return await hass.async_add_job(nexia_home.update)
-
-    coordinator = DataUpdateCoordinator(
-        hass,
-        _LOGGER,
-        name="Nexia update",
-        update_method=_async_update_data,
-        update_interval=timedelta(seconds=DEFAULT_UPDATE_RATE),
-    )
+        except ClientResponseError as http_ex:
+            await api.async_close()
+            if http_ex.status >= 400 and http_ex.status < 500:
+                _LOGGER.error(
+                    "Access error from Nexia service, please check credentials: %s",
+                    http_ex,
+                )
+                return False
+            _LOGGER.error("HTTP error from Nexia service: %s", http_ex)
+            raise ConfigEntryNotReady
+        except (asyncio.TimeoutError, ClientError) as ex:
+            await api.async_close()
+            _LOGGER.error("Unable to connect to Nexia service: %s", ex)
+            raise ConfigEntryNotReady
+        except Exception:
+            # Such as a malformed answer, the session must still be released
+            await api.async_close()
+            raise
+
+        coordinator.async_build_snapshots()
+        coordinator.async_save_cache()
+
+    pending_commands = NexiaPendingCommands(_async_get_commands_store(hass, entry))
+    await pending_commands.async_load()
+
+    device_index = NexiaDeviceIndex.from_coordinator(coordinator)
+    runtime_tracker = NexiaRuntimeTracker(hass, _async_get_runtime_store(hass, entry))
+    await runtime_tracker.async_load()
+    for thermostat in device_index.thermostats:
+        runtime_tracker.async_track(thermostat)
 
     hass.data[DOMAIN][entry.entry_id] = {
         NEXIA_DEVICE: nexia_home,
+        NEXIA_API: api,
         UPDATE_COORDINATOR: coordinator,
+        DEVICE_INDEX: device_index,
+        PENDING_COMMANDS: pending_commands,
+        RUNTIME_TRACKER: runtime_tracker,
+        UPDATE_LISTENER: entry.add_update_listener(_async_update_options),
     }
 
     for component in PLATFORMS:
@@ -118,6 +168,45 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
         )
     )
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        nexia_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await nexia_data[UPDATE_COORDINATOR].async_stop()
+        await nexia_data[NEXIA_API].async_close()
+        await nexia_data[RUNTIME_TRACKER].async_stop()
+        await nexia_data[PENDING_COMMANDS].async_stop()
+        nexia_data[UPDATE_LISTENER]()
+        if not hass.data[DOMAIN]:
+            # bulk_set serves every entry, it goes with the last one
+            hass.services.async_remove(DOMAIN, SERVICE_BULK_SET)
 
     return unload_ok
+
+
+async def _async_update_options(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload the entry with the new options."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Forget everything stored for the entry when it is removed."""
+    await _async_get_store(hass, entry).async_remove()
+    await _async_get_commands_store(hass, entry).async_remove()
+    await _async_get_runtime_store(hass, entry).async_remove()
+    username = entry.data[CONF_USERNAME]
+    # The session is shared by every entry of the account
+    if not any(
+        other.entry_id != entry.entry_id and other.data[CONF_USERNAME] == username
+        for other in hass.config_entries.async_entries(DOMAIN)
+    ):
+        await session_store(hass, username).async_remove()
+
+
+def _async_get_store(hass, entry):
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}")
+
+
+def _async_get_commands_store(hass, entry):
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.commands.{entry.entry_id}")
+
+
+def _async_get_runtime_store(hass, entry):
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.runtime.{entry.entry_id}")
@@ -0,0 +1,649 @@
+"""Asyncio transport for the Nexia mobile API."""
+import asyncio
+from collections import Counter
+import hashlib
+import json
+import logging
+import math
+
+from aiohttp import ClientConnectionError, hdrs
+import async_timeout
+from nexia.automation import NexiaAutomation
+from nexia.const import (
+    AIR_CLEANER_MODES,
+    APP_VERSION,
+    FAN_MODES,
+    HOLD_PERMANENT,
+    OPERATION_MODE_COOL,
+    OPERATION_MODE_HEAT,
+    OPERATION_MODES,
+    ROOT_URL,
+)
+from nexia.home import DEVICES_ELEMENT, NexiaHome
+from nexia.thermostat import NexiaThermostat
+from nexia.util import load_or_create_uuid
+from nexia.zone import NexiaThermostatZone
+
+from homeassistant.helpers.storage import Store
+
+from .const import API_RETRIES, DOMAIN, STORAGE_VERSION
+from .rate_limit import async_get_rate_limiter
+from .session import async_get_client_session, async_release_client_session
+from .util import account_key
+
+_LOGGER = logging.getLogger(__name__)
+
+API_TIMEOUT = 20
+
+API_MOBILE_THERMOSTAT_URL = ROOT_URL + "/mobile/xxl_thermostats/{thermostat_id}"
+API_MOBILE_ZONE_URL = ROOT_URL + "/mobile/xxl_zones/{zone_id}"
+
+
+class NexiaLoginError(Exception):
+    """Error to indicate the Nexia service rejected the login."""
+
+
+class NexiaApi:
+    """Talk to the Nexia cloud with aiohttp instead of requests.
+
+    The nexia library is still used to parse the house payload and to
+    hold the thermostat, zone and automation state. Only the network
+    round trips are moved onto the event loop.
+
+    The session a login returns is stored per account and reused on the
+    next start, a password login only happens when the service rejects
+    it.
+
+    Polling requests are conditional. They send the ETag and
+    Last-Modified validators of the previous response, and a body that
+    hashes the same as the previous one also counts as unchanged. An
+    unchanged response is not parsed at all. The validators of a url are
+    dropped whenever a command or another url changes the nexia objects
+    it covers.
+
+    Every request of an account, from all its config entries and config
+    flows, goes through one NexiaRateLimiter and one NexiaClientSession.
+    """
+
+    def __init__(self, hass, nexia_home: NexiaHome, root_url=ROOT_URL):
+        """Initialize the api.
+
+        root_url lets the api talk to a stand-in for mynexia.com.
+        """
+        self._hass = hass
+        self._nexia_home = nexia_home
+        self._root_url = root_url.rstrip("/")
+        self._session = async_get_client_session(hass, nexia_home.username)
+        self._uuid = None
+        self._login_lock = asyncio.Lock()
+        self._session_store = session_store(hass, nexia_home.username)
+        self._validators = {}
+        self._command_locks = {}
+        # Answered commands per thermostat, polls drop older answers
+        self._commands_answered = Counter()
+        self._requests = set()
+        self._closed = False
+        self._rate_limiter = async_get_rate_limiter(hass, nexia_home.username)
+        self.house_name = None
+        self.house_json = None
+
+    @property
+    def nexia_home(self):
+        """Return the nexia home the api updates."""
+        return self._nexia_home
+
+    @property
+    def stats(self):
+        """Return the request counters of the account.
+
+        The rate limiter counts the requests it let through and the
+        session the ones that got an answer, so a request cut off on the
+        wire shows up in the first but not the second.
+        """
+        stats = {
+            f"{name}_started" if name == "requests" else name: count
+            for name, count in self._rate_limiter.stats.items()
+        }
+        stats.update(self._session.stats)
+        latency = stats.pop("latency_ms", 0)
+        if stats.get("requests"):
+            stats["average_latency_ms"] = round(latency / stats["requests"])
+        stats["in_flight"] = self._rate_limiter.in_flight
+        stats["queued"] = self._rate_limiter.queued
+        return stats
+
+    @property
+    def is_logged_in(self):
+        """Return True once we have signed in."""
+        return self._nexia_home.api_key is not None
+
+    def _headers(self):
+        return {
+            "X-AppVersion": APP_VERSION,
+            "X-MobileId": str(self._nexia_home.mobile_id),
+            "X-ApiKey": str(self._nexia_home.api_key),
+        }
+
+    async def _async_request(
+        self, method, url, payload=None, relogin=True, conditional=False
+    ):
+        """Make a request and return the decoded json body.
+
+        A conditional request returns None if the body did not change
+        since the last conditional request of the url.
+        """
+        request_url = url
+        if self._root_url != ROOT_URL and url.startswith(ROOT_URL):
+            request_url = self._root_url + url[len(ROOT_URL) :]
+        _LOGGER.debug("%s: Calling url %s with payload: %s", method, url, payload)
+        api_key = self._nexia_home.api_key
+        headers = self._headers()
+        validators = self._validators.get(url, {}) if conditional else {}
+        if validators.get(hdrs.ETAG):
+            headers[hdrs.IF_NONE_MATCH] = validators[hdrs.ETAG]
+        if validators.get(hdrs.LAST_MODIFIED):
+            headers[hdrs.IF_MODIFIED_SINCE] = validators[hdrs.LAST_MODIFIED]
+
+        response = await self._async_send(
+            method, request_url, json=payload, headers=headers, allow_redirects=False
+        )
+        if response.status in (302, 401):
+            # The session expired, we are sent to the login page or refused
+            if not relogin:
+                # Signing in, or a fresh login, did not help
+                raise NexiaLoginError(
+                    f"Nexia refused the login with status {response.status}"
+                )
+            await self._async_relogin(api_key)
+            return await self._async_request(
+                method, url, payload, relogin=False, conditional=conditional
+            )
+        if response.status == 304 and validators:
+            return None
+        response.raise_for_status()
+        if not conditional:
+            return await response.json(content_type=None)
+        body = await response.read()
+
+        digest = hashlib.sha256(body).digest()
+        self._validators[url] = {
+            hdrs.ETAG: response.headers.get(hdrs.ETAG),
+            hdrs.LAST_MODIFIED: response.headers.get(hdrs.LAST_MODIFIED),
+            "digest": digest,
+        }
+        if validators.get("digest") == digest:
+            return None
+        return json.loads(body)
+
+    async def _async_send(self, method, url, **kwargs):
+        """Send a request when the rate limiter lets it go.
+
+        Commands and logins take the priority lane. A throttled request,
+        or a poll the service failed, is sent again after the backoff.
+        The response of the last attempt is returned with its body read,
+        so it holds neither a connection nor a place in the limiter.
+        """
+        if self._closed:
+            raise ClientConnectionError("The Nexia entry was unloaded")
+        task = self._hass.async_create_task(
+            self._async_send_with_retries(method, url, **kwargs)
+        )
+        self._requests.add(task)
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if self._closed:
+                # Only the request was cancelled, not the caller
+                raise ClientConnectionError("The Nexia entry was unloaded")
+            raise
+        finally:
+            self._requests.discard(task)
+
+    async def _async_send_with_retries(self, method, url, **kwargs):
+        priority = method != "GET"
+        for attempt in range(API_RETRIES + 1):
+            async with self._rate_limiter.async_slot(priority):
+                try:
+                    with async_timeout.timeout(API_TIMEOUT):
+                        response = await self._session.async_request(
+                            method, url, **kwargs
+                        )
+                except asyncio.TimeoutError:
+                    self._rate_limiter.stats["timeouts"] += 1
+                    raise
+            if response.status < 400:
+                self._rate_limiter.async_success()
+                return response
+            if response.status != 429 and response.status < 500:
+                return response
+            self._rate_limiter.async_backoff(_retry_after(response))
+            # Commands the service failed on may have been applied anyway
+            if attempt == API_RETRIES or (response.status != 429 and priority):
+                return response
+            _LOGGER.debug(
+                "%s: %s answered %s, trying again", method, url, response.status
+            )
+
+    async def async_close(self):
+        """Cancel the requests that are queued or on the wire, release the session.
+
+        Callers waiting for a cancelled request, and every later request,
+        get a ClientConnectionError.
+        """
+        self._closed = True
+        for task in self._requests:
+            task.cancel()
+        await async_release_client_session(self._hass, self._nexia_home.username)
+
+    def _forget_validators(self, urls):
+        """The nexia objects no longer hold what these urls last returned."""
+        for url in urls:
+            self._validators.pop(url, None)
+
+    def _house_url(self):
+        return NexiaHome.API_MOBILE_HOUSES_URL.format(
+            house_id=self._nexia_home.house_id
+        )
+
+    async def async_post(self, url, payload):
+        """Post a payload to the api."""
+        return await self._async_request("POST", url, payload)
+
+    async def async_get(self, url):
+        """Get a url from the api."""
+        return await self._async_request("GET", url)
+
+    async def async_login(self):
+        """Sign in and find the house id if it is not known yet."""
+        nexia_home = self._nexia_home
+        if self._uuid is None:
+            self._uuid = await self._hass.async_add_executor_job(
+                load_or_create_uuid, f"nexia_config_{nexia_home.username}.conf"
+            )
+        payload = {
+            "login": nexia_home.username,
+            "password": nexia_home.password,
+            "children": [],
+            "childSchemas": [],
+            "commitModel": None,
+            "nextHref": None,
+            "device_uuid": str(self._uuid),
+            "device_name": nexia_home._device_name,  # pylint: disable=protected-access
+            "app_version": APP_VERSION,
+            "is_commercial": False,
+        }
+        json_dict = await self._async_request(
+            "POST", NexiaHome.API_MOBILE_ACCOUNTS_SIGN_IN_URL, payload, relogin=False
+        )
+        if json_dict.get("success") is not True:
+            raise NexiaLoginError(json_dict.get("error", "Unknown Error"))
+
+        nexia_home.mobile_id = json_dict["result"]["mobile_id"]
+        nexia_home.api_key = json_dict["result"]["api_key"]
+
+        if not nexia_home.house_id:
+            await self._async_find_house_id()
+
+        await self._session_store.async_save(
+            {
+                "mobile_id": nexia_home.mobile_id,
+                "api_key": nexia_home.api_key,
+                "house_id": nexia_home.house_id,
+                "device_uuid": str(self._uuid),
+            }
+        )
+
+    async def async_ensure_login(self):
+        """Sign in unless we already are, once for concurrent callers.
+
+        A stored session is used without checking it, requests made with
+        an expired one log in again.
+        """
+        async with self._login_lock:
+            if self.is_logged_in or await self._async_restore_session():
+                return
+            await self.async_login()
+
+    async def _async_relogin(self, rejected_api_key):
+        async with self._login_lock:
+            # Concurrent requests share the login of the first one
+            if self._nexia_home.api_key == rejected_api_key:
+                await self.async_login()
+
+    async def _async_restore_session(self):
+        session = await self._session_store.async_load()
+        if not session:
+            return False
+        nexia_home = self._nexia_home
+        self._uuid = session["device_uuid"]
+        nexia_home.mobile_id = session["mobile_id"]
+        nexia_home.api_key = session["api_key"]
+        if not nexia_home.house_id:
+            nexia_home.house_id = session["house_id"]
+        _LOGGER.debug("Reusing the stored Nexia session")
+        return True
+
+    async def _async_find_house_id(self):
+        json_dict = await self._async_request(
+            "POST",
+            NexiaHome.API_MOBILE_SESSION_URL,
+            {"app_version": APP_VERSION, "device_uuid": str(self._uuid)},
+            relogin=False,
+        )
+        data = json_dict["result"]["_links"]["child"][0]["data"]
+        self._nexia_home.house_id = data["id"]
+        self.house_name = data["name"]
+
+    async def async_update(self):
+        """Download the house and update the nexia objects.
+
+        Return False if the house did not change since the last update.
+        """
+        url = self._house_url()
+        json_dict = await self._async_request("GET", url, conditional=True)
+        if json_dict is None:
+            return False
+        self.update_from_json(json_dict)
+        # Every thermostat and zone now holds what the house returned
+        self._validators = {url: self._validators[url]}
+        return True
+
+    def command_lock(self, thermostat: NexiaThermostat):
+        """Return the lock held while several commands change a thermostat.
+
+        Polls of the thermostat and its zones wait for it before they
+        apply their answer, so they never show the state between two
+        commands that belong together. The request of a poll goes out
+        without the lock, and an answer sent before a command was
+        answered is dropped.
+        """
+        lock = self._command_locks.get(thermostat.thermostat_id)
+        if lock is None:
+            lock = self._command_locks[thermostat.thermostat_id] = asyncio.Lock()
+        return lock
+
+    async def async_update_thermostat(self, thermostat: NexiaThermostat):
+        """Download one thermostat with its zones and update the nexia objects.
+
+        Return False if the thermostat did not change since the last update.
+        """
+        url = API_MOBILE_THERMOSTAT_URL.format(thermostat_id=thermostat.thermostat_id)
+        answered = self._commands_answered[thermostat.thermostat_id]
+        json_dict = await self._async_request("GET", url, conditional=True)
+        async with self.command_lock(thermostat):
+            if not self._is_poll_current(thermostat, answered, url, json_dict):
+                return False
+            thermostat_json = json_dict["result"]
+            thermostat.update_thermostat_json(thermostat_json)
+        self._replace_house_thermostat(thermostat_json)
+        self._forget_validators(
+            [self._house_url()]
+            + [
+                API_MOBILE_ZONE_URL.format(zone_id=zone.zone_id)
+                for zone in thermostat.zones
+            ]
+        )
+        return True
+
+    async def async_update_zone(self, zone: NexiaThermostatZone):
+        """Download one zone and update its nexia object.
+
+        Return False if the zone did not change since the last update.
+        """
+        url = API_MOBILE_ZONE_URL.format(zone_id=zone.zone_id)
+        answered = self._commands_answered[zone.thermostat.thermostat_id]
+        json_dict = await self._async_request("GET", url, conditional=True)
+        async with self.command_lock(zone.thermostat):
+            if not self._is_poll_current(zone.thermostat, answered, url, json_dict):
+                return False
+            zone.update_zone_json(json_dict["result"])
+        self._forget_zone_validators(zone, keep=url)
+        return True
+
+    def _is_poll_current(self, thermostat, answered, url, json_dict):
+        """Return True if the answer of a poll is newer than every command's."""
+        if self._commands_answered[thermostat.thermostat_id] != answered:
+            # The answer may predate the command, the next poll fetches it again
+            self._forget_validators([url])
+            return False
+        return json_dict is not None
+
+    def _forget_zone_validators(self, zone, keep=None):
+        """Forget every url covering the zone except keep."""
+        self._forget_validators(
+            url
+            for url in (
+                self._house_url(),
+                API_MOBILE_THERMOSTAT_URL.format(
+                    thermostat_id=zone.thermostat.thermostat_id
+                ),
+                API_MOBILE_ZONE_URL.format(zone_id=zone.zone_id),
+            )
+            if url != keep
+        )
+
+    def _replace_house_thermostat(self, thermostat_json):
+        """Keep house_json current for the cache."""
+        if self.house_json is None:
+            return
+        devices = self.house_json["result"]["_links"]["child"][DEVICES_ELEMENT]
+        items = devices["data"]["items"]
+        for index, item in enumerate(items):
+            if item["id"] == thermostat_json["id"]:
+                items[index] = thermostat_json
+                return
+
+    def update_from_json(self, json_dict):
+        """Update the nexia objects from a payload of the houses endpoint."""
+        self._nexia_home.update_from_json(json_dict)
+        self.house_name = self._nexia_home.get_name()
+        self.house_json = json_dict
+
+    ########################################################################
+    # Thermostat commands
+
+    async def _async_thermostat_command(
+        self, thermostat: NexiaThermostat, end_point, payload
+    ):
+        url = NexiaThermostat.API_MOBILE_THERMOSTAT_URL.format(
+            end_point=end_point, thermostat_id=thermostat.thermostat_id
+        )
+        json_dict = await self.async_post(url, payload)
+        thermostat.update_thermostat_json(json_dict["result"])
+        self._commands_answered[thermostat.thermostat_id] += 1
+        for zone in thermostat.zones:
+            self._forget_zone_validators(zone)
+
+    async def async_set_fan_mode(self, thermostat: NexiaThermostat, fan_mode: str):
+        """Set the fan mode of a thermostat."""
+        fan_mode = fan_mode.lower()
+        if fan_mode not in FAN_MODES:
+            raise KeyError("Invalid fan mode specified")
+        await self._async_thermostat_command(
+            thermostat, "fan_mode", {"value": fan_mode}
+        )
+
+    async def async_set_air_cleaner(
+        self, thermostat: NexiaThermostat, air_cleaner_mode: str
+    ):
+        """Set the air cleaner mode of a thermostat."""
+        air_cleaner_mode = air_cleaner_mode.lower()
+        if air_cleaner_mode not in AIR_CLEANER_MODES:
+            raise KeyError("Invalid air cleaner mode specified")
+        if air_cleaner_mode == thermostat.get_air_cleaner_mode():
+            return
+        await self._async_thermostat_command(
+            thermostat, "air_cleaner_mode", {"value": air_cleaner_mode}
+        )
+
+    async def async_set_emergency_heat(
+        self, thermostat: NexiaThermostat, emergency_heat_on: bool
+    ):
+        """Enable or disable emergency heat on a thermostat."""
+        if not thermostat.has_emergency_heat():
+            raise Exception("This thermostat does not support emergency heat.")
+        await self._async_thermostat_command(
+            thermostat, "emergency_heat", {"value": bool(emergency_heat_on)}
+        )
+
+    async def async_set_dehumidify_setpoint(
+        self, thermostat: NexiaThermostat, dehumidify_setpoint: float
+    ):
+        """Set the dehumidify setpoint (0-1) of a thermostat."""
+        await self._async_set_humidity_setpoint(
+            thermostat, "dehumidify", dehumidify_setpoint
+        )
+
+    async def async_set_humidify_setpoint(
+        self, thermostat: NexiaThermostat, humidify_setpoint: float
+    ):
+        """Set the humidify setpoint (0-1) of a thermostat."""
+        await self._async_set_humidity_setpoint(
+            thermostat, "humidify", humidify_setpoint
+        )
+
+    async def _async_set_humidity_setpoint(self, thermostat, end_point, setpoint):
+        if not thermostat.has_relative_humidity():
+            raise Exception(
+                "Setting target humidity is not supported on this thermostat."
+            )
+        min_humidity, max_humidity = thermostat.get_humidity_setpoint_limits()
+        setpoint = round(0.05 * round(setpoint / 0.05), 2)
+        if not min_humidity <= setpoint <= max_humidity:
+            raise ValueError(
+                f"{end_point} setpoint must be between "
+                f"({min_humidity} - {max_humidity})"
+            )
+        await self._async_thermostat_command(thermostat, end_point, {"value": setpoint})
+
+    ########################################################################
+    # Zone commands
+
+    async def _async_zone_command(self, zone: NexiaThermostatZone, end_point, payload):
+        url = NexiaThermostatZone.API_MOBILE_ZONE_URL.format(
+            end_point=end_point, zone_id=zone.zone_id
+        )
+        json_dict = await self.async_post(url, payload)
+        zone.update_zone_json(json_dict["result"])
+        self._commands_answered[zone.thermostat.thermostat_id] += 1
+        self._forget_zone_validators(zone)
+
+    async def async_return_to_schedule(self, zone: NexiaThermostatZone):
+        """Tell the zone to return to its schedule."""
+        if zone.is_in_permanent_hold():
+            await self._async_zone_command(zone, "return_to_schedule", {})
+
+    async def async_permanent_hold(self, zone: NexiaThermostatZone):
+        """Hold the zone at its current setpoints."""
+        if not zone.is_in_permanent_hold():
+            await self._async_zone_command(zone, "run_mode", {"value": HOLD_PERMANENT})
+
+    async def async_set_mode(self, zone: NexiaThermostatZone, mode: str):
+        """Set the mode of the zone."""
+        if mode not in OPERATION_MODES:
+            raise KeyError(
+                f'Invalid mode "{mode}". Select one of the following: '
+                f"{OPERATION_MODES}"
+            )
+        if zone.get_requested_mode() == mode:
+            return
+        await self._async_zone_command(zone, "zone_mode", {"value": mode})
+
+    async def async_set_preset(self, zone: NexiaThermostatZone, preset: str):
+        """Set the preset of the zone."""
+        if zone.get_preset() == preset:
+            return
+        # pylint: disable=protected-access
+        preset_selected = zone._get_zone_setting("preset_selected")
+        value = 0
+        for option in preset_selected["options"]:
+            if option["label"] == preset:
+                value = option["value"]
+                break
+        await self._async_zone_command(zone, "preset_selected", {"value": value})
+
+    async def async_set_heat_cool_temp(
+        self,
+        zone: NexiaThermostatZone,
+        heat_temperature=None,
+        cool_temperature=None,
+        set_temperature=None,
+    ):
+        """Set the heat and cool setpoints of the zone.
+
+        Mirrors NexiaThermostatZone.set_heat_cool_temp.
+        """
+        heat_temperature, cool_temperature = calculate_setpoints(
+            zone, heat_temperature, cool_temperature, set_temperature
+        )
+        zone.check_heat_cool_setpoints(heat_temperature, cool_temperature)
+        if (
+            zone.get_cooling_setpoint() == cool_temperature
+            and zone.get_heating_setpoint() == heat_temperature
+        ):
+            return
+        await self._async_zone_command(
+            zone, "setpoints", {"heat": heat_temperature, "cool": cool_temperature}
+        )
+
+    ########################################################################
+    # Automation commands
+
+    async def async_activate(self, automation: NexiaAutomation):
+        """Run an automation."""
+        url = NexiaAutomation.API_MOBILE_THERMOSTAT_URL.format(
+            end_point="activate", automation_id=automation.automation_id
+        )
+        await self.async_post(url, None)
+
+
+def _retry_after(response):
+    """Return the seconds a throttled response asks us to wait, if any."""
+    retry_after = response.headers.get(hdrs.RETRY_AFTER, "")
+    if retry_after.isdigit():
+        return int(retry_after)
+    return None
+
+
+def session_store(hass, username):
+    """Return the store holding the session of an account."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.session.{account_key(username)}")
+
+
+def calculate_setpoints(zone, heat_temperature, cool_temperature, set_temperature):
+    """Work out the heat and cool setpoints the way the nexia library does."""
+    deadband = zone.thermostat.get_deadband()
+
+    if set_temperature is None:
+        if heat_temperature:
+            heat_temperature = zone.round_temp(heat_temperature)
+        else:
+            heat_temperature = min(
+                zone.get_heating_setpoint(),
+                zone.round_temp(cool_temperature) - deadband,
+            )
+
+        if cool_temperature:
+            cool_temperature = zone.round_temp(cool_temperature)
+        else:
+            cool_temperature = max(
+                zone.get_cooling_setpoint(),
+                zone.round_temp(heat_temperature) + deadband,
+            )
+        return heat_temperature, cool_temperature
+
+    zone_mode = zone.get_current_mode()
+    if zone_mode == OPERATION_MODE_COOL:
+        cool_temperature = zone.round_temp(set_temperature)
+        heat_temperature = min(
+            zone.get_heating_setpoint(), cool_temperature - deadband,
+        )
+    elif zone_mode == OPERATION_MODE_HEAT:
+        heat_temperature = zone.round_temp(set_temperature)
+        cool_temperature = max(
+            zone.get_cooling_setpoint(), heat_temperature + deadband,
+        )
+    else:
+        cool_temperature = zone.round_temp(set_temperature) + math.ceil(deadband / 2)
+        heat_temperature = zone.round_temp(set_temperature) - math.ceil(deadband / 2)
+    return heat_temperature, cool_temperature
@@ -1,4 +1,5 @@
 """Support for Nexia / Trane XL thermostats."""
+import asyncio
 import logging
 
 from nexia.const import (
@@ -14,11 +15,13 @@ from nexia.const import (
 )
 import voluptuous as vol
 
-from homeassistant.components.climate import ClimateDevice
+from homeassistant.components.climate import DOMAIN as CLIMATE_DOMAIN, ClimateDevice
 from homeassistant.components.climate.const import (
     ATTR_HUMIDITY,
+    ATTR_HVAC_MODE,
     ATTR_MAX_HUMIDITY,
     ATTR_MIN_HUMIDITY,
+    ATTR_PRESET_MODE,
     ATTR_TARGET_TEMP_HIGH,
     ATTR_TARGET_TEMP_LOW,
     CURRENT_HVAC_COOL,
@@ -37,16 +40,19 @@ from homeassistant.components.climate.const import (
     SUPPORT_TARGET_TEMPERATURE,
     SUPPORT_TARGET_TEMPERATURE_RANGE,
 )
-from homeassistant.const import (
-    ATTR_ENTITY_ID,
-    ATTR_TEMPERATURE,
-    TEMP_CELSIUS,
-    TEMP_FAHRENHEIT,
-)
+from homeassistant.const import ATTR_ENTITY_ID, ATTR_TEMPERATURE
+from homeassistant.core import callback
 from homeassistant.helpers import entity_platform
 import homeassistant.helpers.config_validation as cv
-from homeassistant.helpers.dispatcher import dispatcher_send
 
+from .commands import (
+    CMD_COOL_TEMPERATURE,
+    CMD_HEAT_TEMPERATURE,
+    CMD_HVAC_MODE,
+    CMD_PRESET,
+    CMD_SET_TEMPERATURE,
+    NexiaZoneCommandBuffer,
+)
 from .const import (
     ATTR_AIRCLEANER_MODE,
     ATTR_DEHUMIDIFY_SETPOINT,
@@ -54,13 +60,18 @@ from .const import (
     ATTR_HUMIDIFY_SETPOINT,
     ATTR_HUMIDIFY_SUPPORTED,
     ATTR_ZONE_STATUS,
+    ATTR_ZONES,
+    BULK_SET_CONCURRENCY,
+    DEVICE_INDEX,
     DOMAIN,
-    NEXIA_DEVICE,
-    SIGNAL_THERMOSTAT_UPDATE,
-    SIGNAL_ZONE_UPDATE,
-    UPDATE_COORDINATOR,
+    EVENT_BULK_SET_RESULT,
+    NEXIA_API,
+    PENDING_COMMANDS,
+    SERVICE_BULK_SET,
 )
+from .coordinator import thermostat_key
 from .entity import NexiaThermostatZoneEntity
+from .signals import async_get_signal_aggregator
 from .util import percent_conv
 
 SERVICE_SET_AIRCLEANER_MODE = "set_aircleaner_mode"
@@ -105,51 +116,191 @@ NEXIA_TO_HA_HVAC_MODE_MAP = {
     value: key for key, value in HA_TO_NEXIA_HVAC_MODE_MAP.items()
 }
 
+# bulk_set targets and the zone commands they become
+BULK_SET_COMMANDS = {
+    ATTR_HVAC_MODE: CMD_HVAC_MODE,
+    ATTR_PRESET_MODE: CMD_PRESET,
+    ATTR_TARGET_TEMP_LOW: CMD_HEAT_TEMPERATURE,
+    ATTR_TARGET_TEMP_HIGH: CMD_COOL_TEMPERATURE,
+    ATTR_TEMPERATURE: CMD_SET_TEMPERATURE,
+}
+
+BULK_SET_TARGETS = {
+    vol.Optional(ATTR_HVAC_MODE): vol.In(HA_TO_NEXIA_HVAC_MODE_MAP),
+    vol.Optional(ATTR_PRESET_MODE): cv.string,
+    vol.Optional(ATTR_TEMPERATURE): vol.Coerce(float),
+    vol.Inclusive(ATTR_TARGET_TEMP_LOW, "temperature_range"): vol.Coerce(float),
+    vol.Inclusive(ATTR_TARGET_TEMP_HIGH, "temperature_range"): vol.Coerce(float),
+}
+
+
+def _has_bulk_set_targets(config):
+    """Require a zone and something to set for every zone."""
+    if not config[ATTR_ENTITY_ID] and not config[ATTR_ZONES]:
+        raise vol.Invalid(f"No zones given in {ATTR_ENTITY_ID} or {ATTR_ZONES}")
+    if any(key in config for key in BULK_SET_COMMANDS):
+        return config
+    with_targets = {
+        zone[ATTR_ENTITY_ID]
+        for zone in config[ATTR_ZONES]
+        if any(key in zone for key in BULK_SET_COMMANDS)
+    }
+    without_targets = [
+        entity_id
+        for entity_id in config[ATTR_ENTITY_ID]
+        + [zone[ATTR_ENTITY_ID] for zone in config[ATTR_ZONES]]
+        if entity_id not in with_targets
+    ]
+    if without_targets:
+        raise vol.Invalid(f"Nothing to set for {', '.join(without_targets)}")
+    return config
+
+
+BULK_SET_SCHEMA = vol.All(
+    vol.Schema(
+        {
+            vol.Optional(ATTR_ENTITY_ID, default=[]): cv.entity_ids,
+            vol.Optional(ATTR_ZONES, default=[]): [
+                vol.Schema(
+                    {vol.Required(ATTR_ENTITY_ID): cv.entity_id, **BULK_SET_TARGETS}
+                )
+            ],
+            **BULK_SET_TARGETS,
+        }
+    ),
+    _has_bulk_set_targets,
+)
+
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up climate for a Nexia device."""
 
     nexia_data = hass.data[DOMAIN][config_entry.entry_id]
-    nexia_home = nexia_data[NEXIA_DEVICE]
-    coordinator = nexia_data[UPDATE_COORDINATOR]
+    device_index = nexia_data[DEVICE_INDEX]
+    api = nexia_data[NEXIA_API]
 
     platform = entity_platform.current_platform.get()
 
     platform.async_register_entity_service(
         SERVICE_SET_HUMIDIFY_SETPOINT,
         SET_HUMIDITY_SCHEMA,
-        SERVICE_SET_HUMIDIFY_SETPOINT,
+        f"async_{SERVICE_SET_HUMIDIFY_SETPOINT}",
     )
     platform.async_register_entity_service(
-        SERVICE_SET_AIRCLEANER_MODE, SET_AIRCLEANER_SCHEMA, SERVICE_SET_AIRCLEANER_MODE
+        SERVICE_SET_AIRCLEANER_MODE,
+        SET_AIRCLEANER_SCHEMA,
+        f"async_{SERVICE_SET_AIRCLEANER_MODE}",
+    )
+
+    if not hass.services.has_service(DOMAIN, SERVICE_BULK_SET):
+
+        async def async_bulk_set(call):
+            await _async_bulk_set(hass, call)
+
+        hass.services.async_register(
+            DOMAIN, SERVICE_BULK_SET, async_bulk_set, schema=BULK_SET_SCHEMA
+        )
+
+    pending_commands = nexia_data[PENDING_COMMANDS]
+    entities = [NexiaZone(zone, api, pending_commands) for zone in device_index.zones]
+
+    async_add_entities(entities)
+
+
+async def _async_bulk_set(hass, call):
+    """Send the targets of many zones, grouped by thermostat.
+
+    The zones of a thermostat are set one after the other, up to
+    BULK_SET_CONCURRENCY thermostats at once. The entities of a
+    thermostat are updated once all its zones are set, and every
+    thermostat is refreshed once at the end. The outcome for every zone
+    is fired as an EVENT_BULK_SET_RESULT event in the context of the call.
+    """
+    shared = {key: val for key, val in call.data.items() if key in BULK_SET_COMMANDS}
+    targets = {entity_id: shared for entity_id in call.data[ATTR_ENTITY_ID]}
+    for zone in call.data[ATTR_ZONES]:
+        entity_id = zone[ATTR_ENTITY_ID]
+        targets[entity_id] = _merge_targets(targets.get(entity_id, shared), zone)
+
+    results = {}
+    thermostats = {}
+    component = hass.data[CLIMATE_DOMAIN]
+    for entity_id, target in targets.items():
+        entity = component.get_entity(entity_id)
+        if not isinstance(entity, NexiaZone):
+            results[entity_id] = {"success": False, "error": "Not a Nexia zone"}
+            continue
+        thermostats.setdefault(entity.coordinator, []).append((entity, target))
+
+    semaphore = asyncio.Semaphore(BULK_SET_CONCURRENCY)
+
+    async def async_set_thermostat(coordinator, zones):
+        async with semaphore:
+            for entity, target in zones:
+                try:
+                    await entity.async_send_zone_commands(
+                        {BULK_SET_COMMANDS[key]: val for key, val in target.items()}
+                    )
+                except Exception as err:  # pylint: disable=broad-except
+                    _LOGGER.warning(
+                        "Nexia rejected %s for %s: %s", target, entity.name, err
+                    )
+                    results[entity.entity_id] = {"success": False, "error": str(err)}
+                else:
+                    results[entity.entity_id] = {"success": True}
+        thermostat = coordinator.thermostat
+        coordinator.async_update_thermostat_snapshots(thermostat)
+        coordinator.async_settle()
+        async_get_signal_aggregator(hass).async_signal(
+            thermostat_key(thermostat.thermostat_id)
+        )
+
+    await asyncio.gather(
+        *[
+            async_set_thermostat(coordinator, zones)
+            for coordinator, zones in thermostats.items()
+        ]
+    )
+    await asyncio.gather(
+        *[coordinator.async_request_refresh() for coordinator in thermostats]
+    )
+    hass.bus.async_fire(
+        EVENT_BULK_SET_RESULT, {"results": results}, context=call.context
     )
 
-    entities = []
-    for thermostat_id in nexia_home.get_thermostat_ids():
-        thermostat = nexia_home.get_thermostat_by_id(thermostat_id)
-        for zone_id in thermostat.get_zone_ids():
-            zone = thermostat.get_zone_by_id(zone_id)
-            entities.append(NexiaZone(coordinator, zone))
 
-    async_add_entities(entities, True)
+def _merge_targets(targets, overrides):
+    """Return targets updated with the targets in overrides."""
+    overrides = {key: val for key, val in overrides.items() if key in BULK_SET_COMMANDS}
+    merged = dict(targets)
+    # A single target temperature and a heat/cool range are alternatives
+    if ATTR_TEMPERATURE in overrides:
+        merged.pop(ATTR_TARGET_TEMP_LOW, None)
+        merged.pop(ATTR_TARGET_TEMP_HIGH, None)
+    elif ATTR_TARGET_TEMP_LOW in overrides:
+        merged.pop(ATTR_TEMPERATURE, None)
+    merged.update(overrides)
+    return merged
 
 
 class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
     """Provides Nexia Climate support."""
 
-    def __init__(self, coordinator, zone):
+    def __init__(self, zone_info, api, pending_commands=None):
         """Initialize the thermostat."""
-        super().__init__(
-            coordinator, zone, name=zone.get_name(), unique_id=zone.zone_id
-        )
+        super().__init__(zone_info, name=zone_info.name, unique_id=zone_info.zone_id)
+        self._api = api
+        self._pending_commands = pending_commands
+        self._command_buffer = None
+        # Requested values shown until the cloud confirms or rejects them
+        self._optimistic = {}
         self._undo_humidfy_dispatcher = None
         self._undo_aircleaner_dispatcher = None
-        # The has_* calls are stable for the life of the device
-        # and do not do I/O
-        self._has_relative_humidity = self._thermostat.has_relative_humidity()
-        self._has_emergency_heat = self._thermostat.has_emergency_heat()
-        self._has_humidify_support = self._thermostat.has_humidify_support()
-        self._has_dehumidify_support = self._thermostat.has_dehumidify_support()
+        thermostat_info = zone_info.thermostat
+        self._has_relative_humidity = thermostat_info.has_relative_humidity
+        self._has_emergency_heat = thermostat_info.has_emergency_heat
+        self._has_humidify_support = thermostat_info.has_humidify_support
+        self._has_dehumidify_support = thermostat_info.has_dehumidify_support
 
     @property
     def supported_features(self):
@@ -172,22 +323,24 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
     @property
     def is_fan_on(self):
         """Blower is on."""
-        return self._thermostat.is_blower_active()
+        return self._thermostat_snapshot.is_blower_active
 
     @property
     def temperature_unit(self):
         """Return the unit of measurement."""
-        return TEMP_CELSIUS if self._thermostat.get_unit() == "C" else TEMP_FAHRENHEIT
+        return self._thermostat_info.temperature_unit
 
     @property
     def current_temperature(self):
         """Return the current temperature."""
-        return self._zone.get_temperature()
+        return self._zone_snapshot.temperature
 
     @property
     def fan_mode(self):
         """Return the fan setting."""
-        return self._thermostat.get_fan_mode()
+        if "fan_mode" in self._optimistic:
+            return self._optimistic["fan_mode"]
+        return self._thermostat_snapshot.fan_mode
 
     @property
     def fan_modes(self):
@@ -197,92 +350,106 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
     @property
     def min_temp(self):
         """Minimum temp for the current setting."""
-        return (self._thermostat.get_setpoint_limits())[0]
+        return self._thermostat_snapshot.setpoint_limits[0]
 
     @property
     def max_temp(self):
         """Maximum temp for the current setting."""
-        return (self._thermostat.get_setpoint_limits())[1]
+        return self._thermostat_snapshot.setpoint_limits[1]
 
-    def set_fan_mode(self, fan_mode):
+    async def async_set_fan_mode(self, fan_mode):
         """Set new target fan mode."""
-        self._thermostat.set_fan_mode(fan_mode)
-        self._signal_thermostat_update()
+        self._async_optimistic_command(
+            {"fan_mode": fan_mode},
+            self._async_thermostat_command(
+                self._api.async_set_fan_mode(self._thermostat, fan_mode)
+            ),
+        )
 
     @property
     def preset_mode(self):
         """Preset that is active."""
-        return self._zone.get_preset()
+        if "preset_mode" in self._optimistic:
+            return self._optimistic["preset_mode"]
+        return self._zone_snapshot.preset
 
     @property
     def preset_modes(self):
         """All presets."""
-        return self._zone.get_presets()
+        return list(self._zone_snapshot.presets)
 
-    def set_humidity(self, humidity):
+    async def async_set_humidity(self, humidity):
         """Dehumidify target."""
-        self._thermostat.set_dehumidify_setpoint(humidity / 100.0)
+        await self._api.async_set_dehumidify_setpoint(
+            self._thermostat, humidity / 100.0
+        )
         self._signal_thermostat_update()
 
     @property
     def target_humidity(self):
         """Humidity indoors setpoint."""
         if self._has_dehumidify_support:
-            return percent_conv(self._thermostat.get_dehumidify_setpoint())
+            return percent_conv(self._thermostat_snapshot.dehumidify_setpoint)
         if self._has_humidify_support:
-            return percent_conv(self._thermostat.get_humidify_setpoint())
+            return percent_conv(self._thermostat_snapshot.humidify_setpoint)
         return None
 
     @property
     def current_humidity(self):
         """Humidity indoors."""
         if self._has_relative_humidity:
-            return percent_conv(self._thermostat.get_relative_humidity())
+            return percent_conv(self._thermostat_snapshot.relative_humidity)
         return None
 
     @property
     def target_temperature(self):
         """Temperature we try to reach."""
-        current_mode = self._zone.get_current_mode()
-
-        if current_mode == OPERATION_MODE_COOL:
-            return self._zone.get_cooling_setpoint()
-        if current_mode == OPERATION_MODE_HEAT:
-            return self._zone.get_heating_setpoint()
+        if "target_temperature" in self._optimistic:
+            return self._optimistic["target_temperature"]
+        zone = self._zone_snapshot
+
+        if zone.current_mode == OPERATION_MODE_COOL:
+            return zone.cooling_setpoint
+        if zone.current_mode == OPERATION_MODE_HEAT:
+            return zone.heating_setpoint
         return None
 
     @property
     def target_temperature_step(self):
         """Step size of temperature units."""
-        if self._thermostat.get_unit() == UNIT_FAHRENHEIT:
+        if self._thermostat_snapshot.unit == UNIT_FAHRENHEIT:
             return 1.0
         return 0.5
 
     @property
     def target_temperature_high(self):
         """Highest temperature we are trying to reach."""
-        current_mode = self._zone.get_current_mode()
+        if "target_temperature_high" in self._optimistic:
+            return self._optimistic["target_temperature_high"]
+        zone = self._zone_snapshot
 
-        if current_mode in (OPERATION_MODE_COOL, OPERATION_MODE_HEAT):
+        if zone.current_mode in (OPERATION_MODE_COOL, OPERATION_MODE_HEAT):
             return None
-        return self._zone.get_cooling_setpoint()
+        return zone.cooling_setpoint
 
     @property
     def target_temperature_low(self):
         """Lowest temperature we are trying to reach."""
-        current_mode = self._zone.get_current_mode()
+        if "target_temperature_low" in self._optimistic:
+            return self._optimistic["target_temperature_low"]
+        zone = self._zone_snapshot
 
-        if current_mode in (OPERATION_MODE_COOL, OPERATION_MODE_HEAT):
+        if zone.current_mode in (OPERATION_MODE_COOL, OPERATION_MODE_HEAT):
             return None
-        return self._zone.get_heating_setpoint()
+        return zone.heating_setpoint
 
     @property
     def hvac_action(self) -> str:
         """Operation ie. heat, cool, idle."""
-        system_status = self._thermostat.get_system_status()
-        zone_called = self._zone.is_calling()
+        system_status = self._thermostat_snapshot.system_status
+        zone_called = self._zone_snapshot.is_calling
 
-        if self._zone.get_requested_mode() == OPERATION_MODE_OFF:
+        if self._zone_snapshot.requested_mode == OPERATION_MODE_OFF:
             return CURRENT_HVAC_OFF
         if not zone_called:
             return CURRENT_HVAC_IDLE
@@ -297,8 +464,10 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
     @property
     def hvac_mode(self):
         """Return current mode, as the user-visible name."""
-        mode = self._zone.get_requested_mode()
-        hold = self._zone.is_in_permanent_hold()
+        if "hvac_mode" in self._optimistic:
+            return self._optimistic["hvac_mode"]
+        mode = self._zone_snapshot.requested_mode
+        hold = self._zone_snapshot.is_in_permanent_hold
 
         # If the device is in hold mode with
         # OPERATION_MODE_AUTO
@@ -321,12 +490,28 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
             HVAC_MODE_COOL,
         ]
 
-    def set_temperature(self, **kwargs):
+    async def async_set_temperature(self, **kwargs):
         """Set target temperature."""
         new_heat_temp = kwargs.get(ATTR_TARGET_TEMP_LOW)
         new_cool_temp = kwargs.get(ATTR_TARGET_TEMP_HIGH)
         set_temp = kwargs.get(ATTR_TEMPERATURE)
+        self._async_optimistic_command(
+            {
+                "target_temperature_low": new_heat_temp,
+                "target_temperature_high": new_cool_temp,
+                "target_temperature": set_temp,
+            },
+            self._command_buffer.async_queue(
+                **{
+                    CMD_HEAT_TEMPERATURE: new_heat_temp,
+                    CMD_COOL_TEMPERATURE: new_cool_temp,
+                    CMD_SET_TEMPERATURE: set_temp,
+                }
+            ),
+        )
 
+    async def _async_set_setpoints(self, new_heat_temp, new_cool_temp, set_temp):
+        """Clamp the setpoints to the limits and deadband and send them."""
         deadband = self._thermostat.get_deadband()
         cur_cool_temp = self._zone.get_cooling_setpoint()
         cur_heat_temp = self._zone.get_heating_setpoint()
@@ -346,30 +531,33 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
             if new_cool_temp - new_heat_temp < deadband:
                 new_heat_temp = new_cool_temp - deadband
 
-        self._zone.set_heat_cool_temp(
+        await self._api.async_set_heat_cool_temp(
+            self._zone,
             heat_temperature=new_heat_temp,
             cool_temperature=new_cool_temp,
             set_temperature=set_temp,
         )
-        self._signal_zone_update()
 
     @property
     def is_aux_heat(self):
         """Emergency heat state."""
-        return self._thermostat.is_emergency_heat_active()
+        if "is_aux_heat" in self._optimistic:
+            return self._optimistic["is_aux_heat"]
+        return self._thermostat_snapshot.is_emergency_heat_active
 
     @property
     def device_state_attributes(self):
         """Return the device specific state attributes."""
         data = super().device_state_attributes
 
-        data[ATTR_ZONE_STATUS] = self._zone.get_status()
+        data[ATTR_ZONE_STATUS] = self._zone_snapshot.status
 
         if not self._has_relative_humidity:
             return data
 
-        min_humidity = percent_conv(self._thermostat.get_humidity_setpoint_limits()[0])
-        max_humidity = percent_conv(self._thermostat.get_humidity_setpoint_limits()[1])
+        thermostat = self._thermostat_snapshot
+        min_humidity = percent_conv(thermostat.humidity_setpoint_limits[0])
+        max_humidity = percent_conv(thermostat.humidity_setpoint_limits[1])
         data.update(
             {
                 ATTR_MIN_HUMIDITY: min_humidity,
@@ -380,63 +568,151 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
         )
 
         if self._has_dehumidify_support:
-            dehumdify_setpoint = percent_conv(
-                self._thermostat.get_dehumidify_setpoint()
-            )
+            dehumdify_setpoint = percent_conv(thermostat.dehumidify_setpoint)
             data[ATTR_DEHUMIDIFY_SETPOINT] = dehumdify_setpoint
 
         if self._has_humidify_support:
-            humdify_setpoint = percent_conv(self._thermostat.get_humidify_setpoint())
+            humdify_setpoint = percent_conv(thermostat.humidify_setpoint)
             data[ATTR_HUMIDIFY_SETPOINT] = humdify_setpoint
 
         return data
 
-    def set_preset_mode(self, preset_mode: str):
+    async def async_set_preset_mode(self, preset_mode: str):
         """Set the preset mode."""
-        self._zone.set_preset(preset_mode)
-        self._signal_zone_update()
+        self._async_optimistic_command(
+            {"preset_mode": preset_mode},
+            self._command_buffer.async_queue(**{CMD_PRESET: preset_mode}),
+        )
 
-    def turn_aux_heat_off(self):
+    async def async_turn_aux_heat_off(self):
         """Turn. Aux Heat off."""
-        self._thermostat.set_emergency_heat(False)
-        self._signal_thermostat_update()
+        self._async_optimistic_command(
+            {"is_aux_heat": False},
+            self._async_thermostat_command(
+                self._api.async_set_emergency_heat(self._thermostat, False)
+            ),
+        )
 
-    def turn_aux_heat_on(self):
+    async def async_turn_aux_heat_on(self):
         """Turn. Aux Heat on."""
-        self._thermostat.set_emergency_heat(True)
-        self._signal_thermostat_update()
+        self._async_optimistic_command(
+            {"is_aux_heat": True},
+            self._async_thermostat_command(
+                self._api.async_set_emergency_heat(self._thermostat, True)
+            ),
+        )
 
-    def turn_off(self):
+    async def async_turn_off(self):
         """Turn. off the zone."""
-        self.set_hvac_mode(OPERATION_MODE_OFF)
-        self._signal_zone_update()
+        await self.async_set_hvac_mode(HVAC_MODE_OFF)
 
-    def turn_on(self):
+    async def async_turn_on(self):
         """Turn. on the zone."""
-        self.set_hvac_mode(OPERATION_MODE_AUTO)
-        self._signal_zone_update()
+        await self.async_set_hvac_mode(HVAC_MODE_AUTO)
 
-    def set_hvac_mode(self, hvac_mode: str) -> None:
+    async def async_set_hvac_mode(self, hvac_mode: str) -> None:
         """Set the system mode (Auto, Heat_Cool, Cool, Heat, etc)."""
+        self._async_optimistic_command(
+            {"hvac_mode": hvac_mode},
+            self._command_buffer.async_queue(**{CMD_HVAC_MODE: hvac_mode}),
+        )
+
+    async def _async_set_hvac_mode(self, hvac_mode):
         if hvac_mode == HVAC_MODE_AUTO:
-            self._zone.call_return_to_schedule()
-            self._zone.set_mode(mode=OPERATION_MODE_AUTO)
+            await self._api.async_return_to_schedule(self._zone)
+            await self._api.async_set_mode(self._zone, OPERATION_MODE_AUTO)
         else:
-            self._zone.call_permanent_hold()
-            self._zone.set_mode(mode=HA_TO_NEXIA_HVAC_MODE_MAP[hvac_mode])
+            await self._api.async_permanent_hold(self._zone)
+            await self._api.async_set_mode(
+                self._zone, HA_TO_NEXIA_HVAC_MODE_MAP[hvac_mode]
+            )
+
+    async def _async_send_zone_commands(self, commands):
+        """Send merged zone commands from the command buffer."""
+        try:
+            await self.async_send_zone_commands(commands)
+        finally:
+            self._signal_zone_update()
 
-        self.schedule_update_ha_state()
+    async def async_send_zone_commands(self, commands):
+        """Send zone commands, the caller signals the update.
 
-    def set_aircleaner_mode(self, aircleaner_mode):
+        Nexia has no single request for run mode, mode and setpoints.
+        Requests for what already has the requested value are skipped,
+        the rest go back to back while polls of the thermostat hold their
+        answers back.
+        """
+        async with self._api.command_lock(self._thermostat):
+            if CMD_HVAC_MODE in commands:
+                await self._async_set_hvac_mode(commands[CMD_HVAC_MODE])
+            if CMD_PRESET in commands:
+                await self._api.async_set_preset(self._zone, commands[CMD_PRESET])
+            if (
+                CMD_HEAT_TEMPERATURE in commands
+                or CMD_COOL_TEMPERATURE in commands
+                or CMD_SET_TEMPERATURE in commands
+            ):
+                await self._async_set_setpoints(
+                    commands.get(CMD_HEAT_TEMPERATURE),
+                    commands.get(CMD_COOL_TEMPERATURE),
+                    commands.get(CMD_SET_TEMPERATURE),
+                )
+
+    async def async_set_aircleaner_mode(self, aircleaner_mode):
         """Set the aircleaner mode."""
-        self._thermostat.set_air_cleaner(aircleaner_mode)
+        await self._api.async_set_air_cleaner(self._thermostat, aircleaner_mode)
         self._signal_thermostat_update()
 
-    def set_humidify_setpoint(self, humidity):
+    async def async_set_humidify_setpoint(self, humidity):
         """Set the humidify setpoint."""
-        self._thermostat.set_humidify_setpoint(humidity / 100.0)
+        await self._api.async_set_humidify_setpoint(self._thermostat, humidity / 100.0)
         self._signal_thermostat_update()
 
+    async def _async_thermostat_command(self, command):
+        """Send a thermostat command and update everything on the thermostat."""
+        try:
+            await command
+        finally:
+            self._signal_thermostat_update()
+
+    @callback
+    def _async_optimistic_command(self, optimistic, command):
+        """Show the requested values now and send the command in the background."""
+        optimistic = {key: val for key, val in optimistic.items() if val is not None}
+        self._optimistic.update(optimistic)
+        self.async_write_ha_state()
+        self.hass.async_create_task(self._async_reconcile(optimistic, command))
+
+    async def _async_reconcile(self, optimistic, command):
+        """Wait for the cloud and drop the optimistic values it answered for."""
+        try:
+            await command
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.warning(
+                "Nexia rejected %s for %s, rolling back: %s", optimistic, self.name, err
+            )
+            rejected = True
+        else:
+            rejected = False
+
+        for key, value in optimistic.items():
+            # A newer request for the same value may still be in flight
+            if self._optimistic.get(key) == value:
+                del self._optimistic[key]
+
+        if not rejected:
+            for key, value in optimistic.items():
+                actual = getattr(self, key)
+                if key not in self._optimistic and actual != value:
+                    _LOGGER.info(
+                        "Nexia reports %s=%s for %s after %s was requested",
+                        key,
+                        actual,
+                        self.name,
+                        value,
+                    )
+        self.async_write_ha_state()
+
     def _signal_thermostat_update(self):
         """Signal a thermostat update.
 
@@ -446,9 +722,9 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
 
         Update all the zones on the thermostat.
         """
-        dispatcher_send(
-            self.hass, f"{SIGNAL_THERMOSTAT_UPDATE}-{self._thermostat.thermostat_id}"
-        )
+        self._coordinator.async_update_thermostat_snapshots(self._thermostat)
+        self._coordinator.async_settle()
+        async_get_signal_aggregator(self.hass).async_signal(self._thermostat_key)
 
     def _signal_zone_update(self):
         """Signal a zone update.
@@ -458,11 +734,21 @@ class NexiaZone(NexiaThermostatZoneEntity, ClimateDevice):
 
         Update a single zone.
         """
-        dispatcher_send(self.hass, f"{SIGNAL_ZONE_UPDATE}-{self._zone.zone_id}")
-
-    async def async_update(self):
-        """Update the entity.
+        self._coordinator.async_update_thermostat_snapshots(self._thermostat)
+        self._coordinator.async_settle()
+        async_get_signal_aggregator(self.hass).async_signal(self._zone_key)
+
+    async def async_added_to_hass(self):
+        """Set up the command buffer."""
+        await super().async_added_to_hass()
+        self._command_buffer = NexiaZoneCommandBuffer(
+            self.hass,
+            self._async_send_zone_commands,
+            self._zone_info.zone_id,
+            self._pending_commands,
+        )
 
-        Only used by the generic entity update service.
-        """
-        await self._coordinator.async_request_refresh()
+    async def async_will_remove_from_hass(self):
+        """Drop pending commands."""
+        await super().async_will_remove_from_hass()
+        self._command_buffer.async_cancel()
@@ -0,0 +1,294 @@
+"""Zone command handling for Nexia / Trane XL Thermostats."""
+import asyncio
+import logging
+from time import time
+
+from aiohttp import ClientError, ClientResponseError
+
+from homeassistant.core import callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.event import async_call_later
+
+from .const import (
+    COMMAND_DEBOUNCE_TIME,
+    COMMAND_QUEUE_MAX_AGE,
+    COMMAND_QUEUE_SAVE_DELAY,
+    COMMAND_RETRY_MAX,
+    COMMAND_RETRY_MIN,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+CMD_HVAC_MODE = "hvac_mode"
+CMD_PRESET = "preset"
+CMD_HEAT_TEMPERATURE = "heat_temperature"
+CMD_COOL_TEMPERATURE = "cool_temperature"
+CMD_SET_TEMPERATURE = "set_temperature"
+
+# The order commands are sent in when several are merged
+COMMAND_ORDER = (
+    CMD_HVAC_MODE,
+    CMD_PRESET,
+    CMD_HEAT_TEMPERATURE,
+    CMD_COOL_TEMPERATURE,
+    CMD_SET_TEMPERATURE,
+)
+
+
+def _merge_commands(older, newer):
+    """Merge commands field by field, the newer ones win."""
+    merged = dict(older)
+    # A single target temperature and a heat/cool range are
+    # alternatives, the most recent one wins.
+    if CMD_SET_TEMPERATURE in newer:
+        merged.pop(CMD_HEAT_TEMPERATURE, None)
+        merged.pop(CMD_COOL_TEMPERATURE, None)
+    elif CMD_HEAT_TEMPERATURE in newer or CMD_COOL_TEMPERATURE in newer:
+        merged.pop(CMD_SET_TEMPERATURE, None)
+    merged.update(newer)
+    return merged
+
+
+def _is_transient(err):
+    """Return if a command failed because the cloud could not be reached."""
+    if isinstance(err, ClientResponseError):
+        return err.status == 429 or err.status >= 500
+    return isinstance(err, (asyncio.TimeoutError, ClientError))
+
+
+class NexiaPendingCommands:
+    """Zone commands of a config entry that still have to reach the cloud.
+
+    Commands are kept per zone from the moment they are queued until the
+    cloud took or rejected them, merged the same way the command buffer
+    merges them, and written to storage so they survive a restart. Each
+    field remembers when it was last asked for, and fields older than
+    COMMAND_QUEUE_MAX_AGE are dropped instead of being sent long after.
+    """
+
+    def __init__(self, store):
+        """Initialize the queue."""
+        self._store = store
+        self._zones = {}
+
+    async def async_load(self):
+        """Load the commands left over from the last run."""
+        self._zones = await self._store.async_load() or {}
+        _LOGGER.debug("Loaded pending zone commands: %s", self._zones)
+        for zone_id in list(self._zones):
+            # Drops what is too old, even for zones that are gone
+            self.get(zone_id)
+
+    async def async_stop(self):
+        """Write the commands that are still pending."""
+        await self._store.async_save(self._zones)
+
+    def get(self, zone_id):
+        """Return the commands pending for a zone, dropping those too old."""
+        pending = self._zones.get(str(zone_id))
+        if pending is None:
+            return {}
+        queued_at = pending["queued_at"]
+        expired = {
+            key: val
+            for key, val in pending["commands"].items()
+            if time() - queued_at[key] > COMMAND_QUEUE_MAX_AGE
+        }
+        if expired:
+            _LOGGER.warning(
+                "Dropping zone %s commands that could not be sent in time: %s",
+                zone_id,
+                expired,
+            )
+            self.async_remove(zone_id, expired)
+        return dict(self._zones.get(str(zone_id), {}).get("commands", {}))
+
+    @callback
+    def async_add(self, zone_id, commands):
+        """Keep newly queued commands of a zone until they are sent."""
+        pending = self._zones.get(str(zone_id), {"commands": {}, "queued_at": {}})
+        merged = _merge_commands(pending["commands"], commands)
+        now = time()
+        self._zones[str(zone_id)] = {
+            "commands": merged,
+            "queued_at": {
+                key: now if key in commands else pending["queued_at"][key]
+                for key in merged
+            },
+        }
+        self._store.async_delay_save(self._data, COMMAND_QUEUE_SAVE_DELAY)
+
+    @callback
+    def async_remove(self, zone_id, commands):
+        """Forget commands once they were sent or rejected.
+
+        A field asked for again with another value while the command was
+        on the way stays.
+        """
+        pending = self._zones.get(str(zone_id))
+        if pending is None:
+            return
+        for key, val in commands.items():
+            if pending["commands"].get(key) == val:
+                del pending["commands"][key]
+                del pending["queued_at"][key]
+        if not pending["commands"]:
+            del self._zones[str(zone_id)]
+        self._store.async_delay_save(self._data, COMMAND_QUEUE_SAVE_DELAY)
+
+    def _data(self):
+        return self._zones
+
+
+class NexiaZoneCommandBuffer:
+    """Merge zone commands that arrive close together into one write.
+
+    Commands queued within COMMAND_DEBOUNCE_TIME of the first pending
+    command are merged field by field, last write wins, and handed to
+    send_commands in a single call. Every caller waits for that call and
+    sees its result.
+
+    With a pending queue, commands are kept there from the moment they
+    are queued. When the cloud cannot be reached they are sent again
+    after COMMAND_RETRY_MIN seconds, doubling up to COMMAND_RETRY_MAX,
+    and the callers wait until they are sent, rejected or too old.
+    Newer commands for the same field replace the kept ones. Commands
+    kept from before a restart are sent as soon as the buffer is set up.
+    """
+
+    def __init__(
+        self,
+        hass,
+        send_commands,
+        zone_id=None,
+        pending_commands=None,
+        delay=COMMAND_DEBOUNCE_TIME,
+    ):
+        """Initialize the buffer."""
+        self._hass = hass
+        self._send_commands = send_commands
+        self._zone_id = zone_id
+        self._pending_commands = pending_commands
+        self._delay = delay
+        self._pending = {}
+        self._waiters = []
+        self._unsub_flush = None
+        self._sending = False
+        self._retrying = False
+        self._retry_delay = COMMAND_RETRY_MIN
+        if pending_commands is not None and pending_commands.get(zone_id):
+            _LOGGER.info(
+                "Sending zone %s commands kept from before: %s",
+                zone_id,
+                pending_commands.get(zone_id),
+            )
+            self._async_schedule_flush(self._delay)
+
+    async def async_queue(self, **commands):
+        """Queue commands and wait until they have been sent."""
+        commands = {key: val for key, val in commands.items() if val is not None}
+        if not commands:
+            return
+
+        self._pending = _merge_commands(self._pending, commands)
+        if self._pending_commands is not None:
+            self._pending_commands.async_add(self._zone_id, commands)
+        waiter = self._hass.loop.create_future()
+        self._waiters.append(waiter)
+        if not self._sending and (self._unsub_flush is None or self._retrying):
+            # Kept commands are tried again right away with the new ones
+            self._async_schedule_flush(self._delay)
+        await waiter
+
+    @callback
+    def _async_schedule_flush(self, delay):
+        if self._unsub_flush:
+            self._unsub_flush()
+        self._unsub_flush = async_call_later(self._hass, delay, self._async_flush)
+
+    async def _async_flush(self, _now=None):
+        """Send everything that is pending."""
+        self._unsub_flush = None
+        if self._pending_commands is not None:
+            # Everything queued is kept there, less what got too old
+            commands = self._pending_commands.get(self._zone_id)
+        else:
+            commands = self._pending
+        self._pending = {}
+        waiters, self._waiters = self._waiters, []
+        if not commands:
+            self._retrying = False
+            self._retry_delay = COMMAND_RETRY_MIN
+            _async_fail_waiters(
+                waiters, HomeAssistantError(f"Zone {self._zone_id} commands expired"),
+            )
+            return
+        _LOGGER.debug("Sending %s merged zone commands: %s", len(waiters), commands)
+
+        self._sending = True
+        try:
+            await self._send_commands(
+                {key: commands[key] for key in COMMAND_ORDER if key in commands}
+            )
+        except asyncio.CancelledError:
+            # Unloading, kept commands stay in the queue
+            for waiter in waiters:
+                waiter.cancel()
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            if self._pending_commands is not None and _is_transient(err):
+                self._async_hold(waiters, err)
+                return
+            self._async_release(commands)
+            _async_fail_waiters(waiters, err)
+        else:
+            self._async_release(commands)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(None)
+        finally:
+            self._sending = False
+            if self._pending and self._unsub_flush is None:
+                # Commands queued while these were on the way
+                self._async_schedule_flush(self._delay)
+
+    @callback
+    def _async_hold(self, waiters, err):
+        """Try commands the cloud did not get again later."""
+        # Callers that queued while these were on the way come after
+        self._waiters = waiters + self._waiters
+        self._retrying = True
+        _LOGGER.warning(
+            "Unable to send zone %s commands, trying again in %s seconds: %s",
+            self._zone_id,
+            self._retry_delay,
+            err,
+        )
+        self._async_schedule_flush(self._retry_delay)
+        self._retry_delay = min(COMMAND_RETRY_MAX, self._retry_delay * 2)
+
+    @callback
+    def _async_release(self, commands):
+        """Forget commands once they were sent or rejected."""
+        self._retrying = False
+        self._retry_delay = COMMAND_RETRY_MIN
+        if self._pending_commands is not None:
+            self._pending_commands.async_remove(self._zone_id, commands)
+
+    @callback
+    def async_cancel(self):
+        """Drop anything pending, kept commands stay in the queue."""
+        if self._unsub_flush:
+            self._unsub_flush()
+            self._unsub_flush = None
+        self._pending = {}
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            waiter.cancel()
+
+
+@callback
+def _async_fail_waiters(waiters, err):
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_exception(err)
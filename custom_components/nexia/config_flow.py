@@ -1,14 +1,34 @@
 """Config flow for Nexia integration."""
+import asyncio
 import logging
 
+from aiohttp import ClientError, ClientResponseError
+from nexia.const import ROOT_URL
 from nexia.home import NexiaHome
-from requests.exceptions import ConnectTimeout, HTTPError
 import voluptuous as vol
 
 from homeassistant import config_entries, core, exceptions
-from homeassistant.const import CONF_PASSWORD, CONF_USERNAME
-
-from .const import DOMAIN  # pylint:disable=unused-import
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME
+from homeassistant.core import callback
+
+from .api import NexiaApi, NexiaLoginError
+from .const import (  # pylint:disable=unused-import
+    CONF_COMPRESSOR_SPEED_DELTA,
+    CONF_GRACE_FAILED_POLLS,
+    CONF_GRACE_SECONDS,
+    CONF_HUMIDITY_DELTA,
+    CONF_SENSOR_MAX_INTERVAL,
+    CONF_SENSOR_MIN_INTERVAL,
+    CONF_TEMPERATURE_DELTA,
+    DEFAULT_COMPRESSOR_SPEED_DELTA,
+    DEFAULT_GRACE_FAILED_POLLS,
+    DEFAULT_GRACE_SECONDS,
+    DEFAULT_HUMIDITY_DELTA,
+    DEFAULT_SENSOR_MAX_INTERVAL,
+    DEFAULT_SENSOR_MIN_INTERVAL,
+    DEFAULT_TEMPERATURE_DELTA,
+    DOMAIN,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -20,31 +40,43 @@ async def validate_input(hass: core.HomeAssistant, data):
 
     Data has the keys from DATA_SCHEMA with values provided by the user.
     """
+    nexia_home = NexiaHome(
+        username=data[CONF_USERNAME],
+        password=data[CONF_PASSWORD],
+        auto_login=False,
+        auto_update=False,
+        device_name=hass.config.location_name,
+    )
+    api = NexiaApi(hass, nexia_home, data.get(CONF_URL, ROOT_URL))
     try:
-        nexia_home = NexiaHome(
-            username=data[CONF_USERNAME],
-            password=data[CONF_PASSWORD],
-            auto_login=False,
-            auto_update=False,
-            device_name=hass.config.location_name,
-        )
-        await hass.async_add_executor_job(nexia_home.login)
-    except ConnectTimeout as ex:
-        _LOGGER.error("Unable to connect to Nexia service: %s", ex)
-        raise CannotConnect
-    except HTTPError as http_ex:
+        await _async_login(api)
+    finally:
+        await api.async_close()
+
+    info = {"title": api.house_name, "house_id": nexia_home.house_id}
+    _LOGGER.debug("Setup ok with info: %s", info)
+    return info
+
+
+async def _async_login(api):
+    """Log in and make sure the account has a house."""
+    try:
+        await api.async_login()
+    except NexiaLoginError as ex:
+        _LOGGER.error("Login rejected by Nexia service: %s", ex)
+        raise InvalidAuth
+    except ClientResponseError as http_ex:
         _LOGGER.error("HTTP error from Nexia service: %s", http_ex)
-        if http_ex.response.status_code >= 400 and http_ex.response.status_code < 500:
+        if http_ex.status >= 400 and http_ex.status < 500:
             raise InvalidAuth
         raise CannotConnect
+    except (asyncio.TimeoutError, ClientError) as ex:
+        _LOGGER.error("Unable to connect to Nexia service: %s", ex)
+        raise CannotConnect
 
-    if not nexia_home.get_name():
+    if not api.house_name:
         raise InvalidAuth
 
-    info = {"title": nexia_home.get_name(), "house_id": nexia_home.house_id}
-    _LOGGER.debug("Setup ok with info: %s", info)
-    return info
-
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for Nexia."""
@@ -52,6 +84,12 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     CONNECTION_CLASS = config_entries.CONN_CLASS_CLOUD_POLL
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        """Get the options flow for this handler."""
+        return OptionsFlowHandler(config_entry)
+
     async def async_step_user(self, user_input=None):
         """Handle the initial step."""
         errors = {}
@@ -77,9 +115,75 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     async def async_step_import(self, user_input):
         """Handle import."""
+        # Skip the login for accounts that were imported before
+        for entry in self._async_current_entries():
+            if entry.data[CONF_USERNAME] == user_input[CONF_USERNAME]:
+                return self.async_abort(reason="already_configured")
         return await self.async_step_user(user_input)
 
 
+class OptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle the options of a Nexia entry."""
+
+    def __init__(self, config_entry):
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        """Manage the options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_GRACE_FAILED_POLLS,
+                        default=options.get(
+                            CONF_GRACE_FAILED_POLLS, DEFAULT_GRACE_FAILED_POLLS
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_GRACE_SECONDS,
+                        default=options.get(CONF_GRACE_SECONDS, DEFAULT_GRACE_SECONDS),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_TEMPERATURE_DELTA,
+                        default=options.get(
+                            CONF_TEMPERATURE_DELTA, DEFAULT_TEMPERATURE_DELTA
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_HUMIDITY_DELTA,
+                        default=options.get(
+                            CONF_HUMIDITY_DELTA, DEFAULT_HUMIDITY_DELTA
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_COMPRESSOR_SPEED_DELTA,
+                        default=options.get(
+                            CONF_COMPRESSOR_SPEED_DELTA, DEFAULT_COMPRESSOR_SPEED_DELTA
+                        ),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_SENSOR_MIN_INTERVAL,
+                        default=options.get(
+                            CONF_SENSOR_MIN_INTERVAL, DEFAULT_SENSOR_MIN_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                    vol.Required(
+                        CONF_SENSOR_MAX_INTERVAL,
+                        default=options.get(
+                            CONF_SENSOR_MAX_INTERVAL, DEFAULT_SENSOR_MAX_INTERVAL
+                        ),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0)),
+                }
+            ),
+        )
+
+
 class CannotConnect(exceptions.HomeAssistantError):
     """Error to indicate we cannot connect."""
 
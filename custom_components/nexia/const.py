@@ -8,12 +8,18 @@ NOTIFICATION_ID = "nexia_notification"
 NOTIFICATION_TITLE = "Nexia Setup"
 
 NEXIA_DEVICE = "device"
+NEXIA_API = "api"
 NEXIA_SCAN_INTERVAL = "scan_interval"
 
 DOMAIN = "nexia"
 DEFAULT_ENTITY_NAMESPACE = "nexia"
 
 ATTR_DESCRIPTION = "description"
+ATTR_STALE = "stale"
+ATTR_ZONES = "zones"
+ATTR_DUTY_CYCLE_1H = "duty_cycle_1h"
+ATTR_DUTY_CYCLE_24H = "duty_cycle_24h"
+ATTR_AVERAGE_24H = "average_24h"
 
 ATTR_AIRCLEANER_MODE = "aircleaner_mode"
 
@@ -24,8 +30,104 @@ ATTR_HUMIDIFY_SETPOINT = "humidify_setpoint"
 ATTR_DEHUMIDIFY_SETPOINT = "dehumidify_setpoint"
 
 UPDATE_COORDINATOR = "update_coordinator"
+DEVICE_INDEX = "device_index"
+UPDATE_LISTENER = "update_listener"
+PENDING_COMMANDS = "pending_commands"
+RUNTIME_TRACKER = "runtime_tracker"
+
+# hass.data key of the rate limiters, shared by the entries of an account
+RATE_LIMITERS = "nexia_rate_limiters"
+# hass.data key of the aggregator that coalesces entity update signals
+SIGNAL_AGGREGATOR = "nexia_signal_aggregator"
+# hass.data key of the http sessions, one per account
+SESSIONS = "nexia_sessions"
+
+CONF_GRACE_FAILED_POLLS = "grace_failed_polls"
+CONF_GRACE_SECONDS = "grace_seconds"
+CONF_TEMPERATURE_DELTA = "temperature_delta"
+CONF_HUMIDITY_DELTA = "humidity_delta"
+CONF_COMPRESSOR_SPEED_DELTA = "compressor_speed_delta"
+CONF_SENSOR_MIN_INTERVAL = "sensor_min_interval"
+CONF_SENSOR_MAX_INTERVAL = "sensor_max_interval"
+
+STORAGE_VERSION = 1
+
+# Seconds to wait before writing a changed house to storage
+CACHE_SAVE_DELAY = 60
+
+# Polling intervals in seconds
+DEFAULT_UPDATE_RATE = 120
+ACTIVE_UPDATE_RATE = 30
+IDLE_UPDATE_RATE = 300
+# The whole house is only needed for the automations, thermostats poll alone
+HOUSE_UPDATE_RATE = 300
+
+# Failed polls in a row, or seconds since the last good poll, before
+# the entities become unavailable
+DEFAULT_GRACE_FAILED_POLLS = 3
+DEFAULT_GRACE_SECONDS = 900
+
+# Runtime is kept in buckets of this many seconds for the rolling windows
+RUNTIME_BUCKET_SECONDS = 600
+RUNTIME_SHORT_WINDOW = 3600
+RUNTIME_LONG_WINDOW = 86400
+# Seconds between good refreshes beyond which the time is not counted
+RUNTIME_MAX_GAP = 900
+# Seconds to wait before writing the runtime counters to storage
+RUNTIME_SAVE_DELAY = 300
+
+# How far a temperature, humidity or compressor speed sensor has to move
+# from the last state it wrote before it writes a new one, the seconds
+# that have to pass between two states, and the seconds after which a
+# smaller change is written anyway
+DEFAULT_TEMPERATURE_DELTA = 0
+DEFAULT_HUMIDITY_DELTA = 0
+DEFAULT_COMPRESSOR_SPEED_DELTA = 0
+DEFAULT_SENSOR_MIN_INTERVAL = 0
+DEFAULT_SENSOR_MAX_INTERVAL = 900
+
+# How many thermostats may refresh at the same time
+THERMOSTAT_REFRESH_CONCURRENCY = 4
+
+# Requests per second an account may make, and how many may go at once
+API_RATE = 4
+API_BURST = 20
+# Requests an account may have on the wire at once, the rest queue
+API_MAX_IN_FLIGHT = 8
+# Seconds to wait for a connection, and to keep an idle one open
+API_CONNECT_TIMEOUT = 10
+API_KEEPALIVE_TIMEOUT = 60
+# Seconds to hold requests back after the service throttled or failed,
+# doubled for every failure in a row
+API_BACKOFF_BASE = 2
+API_BACKOFF_MAX = 300
+# How often a throttled or failed request is tried again
+API_RETRIES = 3
+
+# How many thermostats the bulk_set service sends commands to at once
+BULK_SET_CONCURRENCY = 4
+
+# How long to keep polling at the active rate after a command or scene
+COMMAND_SETTLE_TIME = 120
+
+# How often and for how long to poll the thermostats after a scene
+SCENE_VERIFY_INTERVAL = 3
+SCENE_VERIFY_TIMEOUT = 60
+# Rounds a thermostat the scene did not change is polled before it is done
+SCENE_VERIFY_UNCHANGED_ROUNDS = 3
+
+# Zone commands arriving within this many seconds are merged into one write
+COMMAND_DEBOUNCE_TIME = 0.5
+# Zone commands that could not reach the cloud are kept and tried again,
+# waiting twice as long after every failure in a row
+COMMAND_RETRY_MIN = 15
+COMMAND_RETRY_MAX = 600
+# Seconds before a kept zone command is too old to send, and before a
+# changed queue is written to storage
+COMMAND_QUEUE_MAX_AGE = 21600
+COMMAND_QUEUE_SAVE_DELAY = 1
 
 MANUFACTURER = "Trane"
 
-SIGNAL_ZONE_UPDATE = "NEXIA_CLIMATE_ZONE_UPDATE"
-SIGNAL_THERMOSTAT_UPDATE = "NEXIA_CLIMATE_THERMOSTAT_UPDATE"
+SERVICE_BULK_SET = "bulk_set"
+EVENT_BULK_SET_RESULT = "nexia_bulk_set_result"
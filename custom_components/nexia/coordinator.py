@@ -0,0 +1,549 @@
+"""Update coordinators for Nexia / Trane XL Thermostats."""
+import asyncio
+from datetime import timedelta
+import logging
+from time import monotonic
+
+from aiohttp import ClientError
+
+from homeassistant.core import callback
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+
+from .api import NexiaLoginError
+from .const import (
+    ACTIVE_UPDATE_RATE,
+    CACHE_SAVE_DELAY,
+    COMMAND_SETTLE_TIME,
+    DEFAULT_GRACE_FAILED_POLLS,
+    DEFAULT_GRACE_SECONDS,
+    DEFAULT_UPDATE_RATE,
+    HOUSE_UPDATE_RATE,
+    IDLE_UPDATE_RATE,
+    SCENE_VERIFY_INTERVAL,
+    SCENE_VERIFY_TIMEOUT,
+    SCENE_VERIFY_UNCHANGED_ROUNDS,
+    THERMOSTAT_REFRESH_CONCURRENCY,
+)
+from .snapshot import (
+    NexiaAutomationSnapshot,
+    NexiaThermostatSnapshot,
+    NexiaZoneSnapshot,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def thermostat_key(thermostat_id):
+    """Return the change key for a thermostat."""
+    return f"thermostat-{thermostat_id}"
+
+
+def zone_key(zone_id):
+    """Return the change key for a zone."""
+    return f"zone-{zone_id}"
+
+
+def automation_key(automation_id):
+    """Return the change key for an automation."""
+    return f"automation-{automation_id}"
+
+
+class _NexiaSnapshotCoordinator(DataUpdateCoordinator):
+    """Keep immutable snapshots in data and track what a refresh changed.
+
+    Snapshots are keyed by thermostat_key, zone_key and automation_key.
+    Entities read only from the snapshots. Comparing them with the
+    previous refresh lets entities skip state writes when their data did
+    not change. Refreshes that changed neither the data nor the
+    availability of the coordinator are not passed on to the listeners at
+    all.
+
+    A failed poll does not make the entities unavailable right away.
+    They keep the last good snapshots until grace_failed_polls polls in a
+    row have failed or grace_seconds have passed since the last good one,
+    whichever comes first. Meanwhile the listeners are only called when
+    the first poll fails and when a good one follows, so the entities
+    write their stale attribute once each way.
+    """
+
+    def __init__(
+        self,
+        hass,
+        api,
+        name,
+        update_rate,
+        grace_failed_polls=DEFAULT_GRACE_FAILED_POLLS,
+        grace_seconds=DEFAULT_GRACE_SECONDS,
+    ):
+        """Initialize the coordinator."""
+        super().__init__(
+            hass, _LOGGER, name=name, update_interval=timedelta(seconds=update_rate),
+        )
+        self.api = api
+        self.data = {}
+        self.changed = set()
+        self.stale = False
+        self.grace_failed_polls = grace_failed_polls
+        self.grace_seconds = grace_seconds
+        self.failed_polls = 0
+        self._last_success = monotonic()
+        self._update_callbacks = []
+        self._refresh_callbacks = []
+        self._notified_available = True
+        self._notified_data_stale = False
+        self._stopped = False
+
+    @property
+    def available(self):
+        """Return False once failed polls have outlasted the grace period."""
+        if self.last_update_success:
+            return True
+        return (
+            self.failed_polls < self.grace_failed_polls
+            and monotonic() - self._last_success < self.grace_seconds
+        )
+
+    @property
+    def data_stale(self):
+        """Return True while the snapshots come from the cache or a failed poll."""
+        return self.stale or not self.last_update_success
+
+    @callback
+    def async_add_listener(self, update_callback):
+        """Listen for data updates."""
+        if not self._update_callbacks:
+            super().async_add_listener(self._async_handle_refresh)
+        self._update_callbacks.append(update_callback)
+
+    @callback
+    def async_remove_listener(self, update_callback):
+        """Remove data update."""
+        self._update_callbacks.remove(update_callback)
+        if not self._update_callbacks:
+            super().async_remove_listener(self._async_handle_refresh)
+
+    @callback
+    def async_add_refresh_listener(self, refresh_callback):
+        """Call back after every good refresh, changed or not, return a remove."""
+        self._refresh_callbacks.append(refresh_callback)
+
+        @callback
+        def async_remove_refresh_listener():
+            self._refresh_callbacks.remove(refresh_callback)
+
+        return async_remove_refresh_listener
+
+    @callback
+    def _async_handle_refresh(self):
+        """Count failed polls after every refresh."""
+        if self.last_update_success:
+            self._async_set_success()
+        else:
+            self.failed_polls += 1
+        self._async_notify_listeners()
+
+    @callback
+    def _async_set_success(self):
+        self.failed_polls = 0
+        self._last_success = monotonic()
+        for refresh_callback in list(self._refresh_callbacks):
+            refresh_callback()
+
+    @callback
+    def _async_notify_listeners(self):
+        available = self.available
+        data_stale = self.data_stale
+        if (
+            not self.changed
+            and available == self._notified_available
+            and data_stale == self._notified_data_stale
+        ):
+            return
+        self._notified_available = available
+        self._notified_data_stale = data_stale
+        for update_callback in list(self._update_callbacks):
+            update_callback()
+
+    @callback
+    def _async_set_snapshots(self, snapshots):
+        previous = self.data or {}
+        self.changed = {
+            key for key, snapshot in snapshots.items() if previous.get(key) != snapshot
+        }
+        if self.stale:
+            # Every entity still shows data from the cache
+            self.stale = False
+            self.changed = set(snapshots)
+        self.data = snapshots
+        _LOGGER.debug("%s changed: %s", self.name, self.changed)
+
+    def has_changed(self, keys):
+        """Return True if the last refresh changed any of the keys."""
+        return not self.changed.isdisjoint(keys)
+
+    async def async_refresh(self):
+        """Refresh data, unless the coordinator was stopped."""
+        if not self._stopped:
+            await super().async_refresh()
+
+    @callback
+    def _schedule_refresh(self):
+        if not self._stopped:
+            super()._schedule_refresh()
+
+    async def async_stop(self):
+        """Stop refreshing, a refresh still running schedules no other."""
+        self._stopped = True
+        if self._unsub_refresh:
+            self._unsub_refresh()
+            self._unsub_refresh = None
+        self._debounced_refresh.async_cancel()
+
+    @callback
+    def _async_set_update_interval(self, rate):
+        update_interval = timedelta(seconds=rate)
+        if update_interval == self.update_interval:
+            return
+        _LOGGER.debug("Changing %s interval to %s", self.name, update_interval)
+        self.update_interval = update_interval
+
+
+class NexiaDataUpdateCoordinator(_NexiaSnapshotCoordinator):
+    """Poll the whole Nexia house.
+
+    The house refresh keeps the automations current and hands every
+    thermostat to its NexiaThermostatCoordinator, which otherwise polls
+    its thermostat on its own. It runs every HOUSE_UPDATE_RATE.
+
+    The last house payload is kept in store so the next start can build
+    its entities from it straight away. Until the first refresh after
+    such a warm start succeeds, the data is stale.
+    """
+
+    def __init__(
+        self,
+        hass,
+        api,
+        store=None,
+        grace_failed_polls=DEFAULT_GRACE_FAILED_POLLS,
+        grace_seconds=DEFAULT_GRACE_SECONDS,
+    ):
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            api,
+            "Nexia update",
+            HOUSE_UPDATE_RATE,
+            grace_failed_polls,
+            grace_seconds,
+        )
+        self._store = store
+        self.thermostat_coordinators = {}
+        # Thermostat refreshes that may run at the same time
+        self.refresh_semaphore = asyncio.Semaphore(THERMOSTAT_REFRESH_CONCURRENCY)
+        self._refresh_task = None
+        self._scene_task = None
+        self._scene_generation = 0
+        self._scene_deadline = 0
+        self._scene_pending = set()
+        self._scene_changed = set()
+        self._scene_unchanged = {}
+
+    async def _async_update_data(self):
+        """Fetch data from API endpoint."""
+        self.changed = set()
+        try:
+            await self.api.async_ensure_login()
+            if not await self.api.async_update():
+                return self.data
+        except NexiaLoginError as err:
+            raise UpdateFailed(f"Login rejected: {err}")
+        self.async_build_snapshots()
+        thermostat_coordinators = self.thermostat_coordinators.values()
+        if self.changed or any(tc.changed for tc in thermostat_coordinators):
+            self.async_save_cache()
+        for thermostat_coordinator in thermostat_coordinators:
+            thermostat_coordinator.async_set_house_update()
+        return self.data
+
+    @callback
+    def async_build_snapshots(self):
+        """Snapshot the automations and every thermostat."""
+        nexia_home = self.api.nexia_home
+        for thermostat in nexia_home.thermostats:
+            thermostat_coordinator = self.thermostat_coordinators.get(
+                thermostat.thermostat_id
+            )
+            if thermostat_coordinator is None:
+                thermostat_coordinator = NexiaThermostatCoordinator(
+                    self.hass, self, thermostat
+                )
+                self.thermostat_coordinators[
+                    thermostat.thermostat_id
+                ] = thermostat_coordinator
+            thermostat_coordinator.async_build_snapshots()
+
+        self._async_set_snapshots(
+            {
+                automation_key(
+                    automation.automation_id
+                ): NexiaAutomationSnapshot.from_automation(automation)
+                for automation in nexia_home.automations
+            }
+        )
+
+    async def async_load_cache(self):
+        """Build stale snapshots from the stored house, return True on success."""
+        if self._store is None:
+            return False
+        cache = await self._store.async_load()
+        if not cache:
+            return False
+        try:
+            self.api.nexia_home.house_id = cache["house_id"]
+            self.api.update_from_json(cache["house"])
+        except (KeyError, TypeError) as err:
+            _LOGGER.warning("Ignoring unusable Nexia cache: %s", err)
+            self.api.nexia_home.house_id = None
+            return False
+        self.async_build_snapshots()
+        self.stale = True
+        for thermostat_coordinator in self.thermostat_coordinators.values():
+            thermostat_coordinator.stale = True
+        return True
+
+    @callback
+    def async_save_cache(self):
+        """Store the last house payload for the next start."""
+        if self._store is not None and self.api.house_json is not None:
+            self._store.async_delay_save(self._cache_data, CACHE_SAVE_DELAY)
+
+    @callback
+    def _cache_data(self):
+        return {
+            "house_id": self.api.nexia_home.house_id,
+            "house": self.api.house_json,
+        }
+
+    @callback
+    def async_verify_scene(self):
+        """Poll the house fast until a scene has taken effect.
+
+        Nothing tells which thermostats an automation changes, so the
+        whole house, which carries every thermostat, is refreshed every
+        SCENE_VERIFY_INTERVAL. A thermostat is done once a refresh
+        changed it and the next one did not, or after
+        SCENE_VERIFY_UNCHANGED_ROUNDS refreshes that never changed it.
+        Polling stops when every thermostat is done or
+        SCENE_VERIFY_TIMEOUT after the last activation. Scenes activated
+        while a verification runs restart its bookkeeping and share its
+        refreshes.
+        """
+        self.async_settle()
+        self._scene_generation += 1
+        self._scene_deadline = monotonic() + SCENE_VERIFY_TIMEOUT
+        self._scene_pending = set(self.thermostat_coordinators.values())
+        self._scene_changed = set()
+        self._scene_unchanged = dict.fromkeys(self._scene_pending, 0)
+        if self._scene_task is None:
+            self._scene_task = self.hass.async_create_task(self._async_verify_scene())
+
+    async def _async_verify_scene(self):
+        try:
+            while self._scene_pending and monotonic() < self._scene_deadline:
+                await asyncio.sleep(SCENE_VERIFY_INTERVAL)
+                generation = self._scene_generation
+                previous = {
+                    thermostat_coordinator: thermostat_coordinator.data
+                    for thermostat_coordinator in self._scene_pending
+                }
+                await self.async_refresh()
+                if generation != self._scene_generation:
+                    # Another scene was activated during the refresh
+                    continue
+                if not self.last_update_success:
+                    continue
+                for thermostat_coordinator, data in previous.items():
+                    # The snapshots are only rebuilt when the house changed
+                    if (
+                        thermostat_coordinator.data is not data
+                        and thermostat_coordinator.changed
+                    ):
+                        self._scene_changed.add(thermostat_coordinator)
+                    elif thermostat_coordinator in self._scene_changed:
+                        self._scene_pending.discard(thermostat_coordinator)
+                    else:
+                        self._scene_unchanged[thermostat_coordinator] += 1
+                        if (
+                            self._scene_unchanged[thermostat_coordinator]
+                            >= SCENE_VERIFY_UNCHANGED_ROUNDS
+                        ):
+                            self._scene_pending.discard(thermostat_coordinator)
+            _LOGGER.debug(
+                "Scene verification done, %s thermostats did not settle",
+                len(self._scene_pending),
+            )
+        finally:
+            self._scene_task = None
+
+    @callback
+    def async_refresh_in_background(self):
+        """Refresh without waiting for it, async_stop cancels the refresh."""
+        self._refresh_task = self.hass.async_create_task(self.async_refresh())
+
+    async def async_stop(self):
+        """Stop refreshing the house and its thermostats.
+
+        A background refresh or scene verification still running is
+        cancelled and waited for, so it is gone before the api closes.
+        """
+        await super().async_stop()
+        tasks = [
+            task for task in (self._refresh_task, self._scene_task) if task is not None
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for thermostat_coordinator in self.thermostat_coordinators.values():
+            await thermostat_coordinator.async_stop()
+
+    @callback
+    def async_settle(self):
+        """Poll every thermostat at the active rate while a scene takes effect."""
+        for thermostat_coordinator in self.thermostat_coordinators.values():
+            thermostat_coordinator.async_settle()
+
+
+class NexiaThermostatCoordinator(_NexiaSnapshotCoordinator):
+    """Poll one thermostat and its zones at a rate that follows what it does.
+
+    - ACTIVE_UPDATE_RATE while any zone is calling, or for
+      COMMAND_SETTLE_TIME after a command or a scene activation.
+    - IDLE_UPDATE_RATE when every zone is idle and following its schedule.
+    - DEFAULT_UPDATE_RATE otherwise.
+
+    Each thermostat has its own health, a failing thermostat only makes
+    its own entities unavailable. The house coordinator bounds how many
+    thermostats refresh at once.
+    """
+
+    def __init__(self, hass, house_coordinator, thermostat):
+        """Initialize the coordinator."""
+        super().__init__(
+            hass,
+            house_coordinator.api,
+            f"Nexia thermostat {thermostat.thermostat_id}",
+            DEFAULT_UPDATE_RATE,
+            house_coordinator.grace_failed_polls,
+            house_coordinator.grace_seconds,
+        )
+        self.thermostat = thermostat
+        self._house_coordinator = house_coordinator
+        self._settle_until = 0
+        self._zone_refreshes = {}
+
+    async def _async_update_data(self):
+        """Fetch the thermostat from API endpoint."""
+        self.changed = set()
+        async with self._house_coordinator.refresh_semaphore:
+            try:
+                await self.api.async_ensure_login()
+                updated = await self.api.async_update_thermostat(self.thermostat)
+            except NexiaLoginError as err:
+                raise UpdateFailed(f"Login rejected: {err}")
+        if not updated:
+            self._async_set_update_interval(self._calculate_update_rate())
+            return self.data
+        self.async_build_snapshots()
+        if self.changed:
+            self._house_coordinator.async_save_cache()
+        return self.data
+
+    @callback
+    def async_build_snapshots(self):
+        """Snapshot the thermostat and work out what changed."""
+        self._async_set_snapshots(_thermostat_snapshots(self.thermostat))
+        self._async_set_update_interval(self._calculate_update_rate())
+
+    async def async_refresh_zone(self, zone):
+        """Fetch one zone and merge it into the snapshots.
+
+        Concurrent requests for the same zone share one fetch.
+        """
+        task = self._zone_refreshes.get(zone.zone_id)
+        if task is None:
+            task = self.hass.async_create_task(self._async_refresh_zone(zone))
+            self._zone_refreshes[zone.zone_id] = task
+            task.add_done_callback(
+                lambda _: self._zone_refreshes.pop(zone.zone_id, None)
+            )
+        await asyncio.shield(task)
+
+    async def _async_refresh_zone(self, zone):
+        try:
+            async with self._house_coordinator.refresh_semaphore:
+                await self.api.async_ensure_login()
+                if not await self.api.async_update_zone(zone):
+                    return
+        except (asyncio.TimeoutError, ClientError, NexiaLoginError) as err:
+            _LOGGER.error("Error refreshing Nexia zone %s: %s", zone.zone_id, err)
+            return
+
+        key = zone_key(zone.zone_id)
+        snapshot = NexiaZoneSnapshot.from_zone(zone)
+        self.changed = {key} if self.data.get(key) != snapshot else set()
+        self.data = {**self.data, key: snapshot}
+        self._async_set_update_interval(self._calculate_update_rate())
+        self._async_notify_listeners()
+
+    @callback
+    def async_set_house_update(self):
+        """Notify listeners of the thermostat a house refresh brought in."""
+        if not self.last_update_success:
+            self.last_update_success = True
+            _LOGGER.info("Fetching %s data recovered", self.name)
+        self._async_set_success()
+        if self._listeners:
+            self._schedule_refresh()
+        self._async_notify_listeners()
+
+    @callback
+    def async_update_thermostat_snapshots(self, thermostat):
+        """Snapshot a thermostat again after a command changed it."""
+        self.data = {**self.data, **_thermostat_snapshots(thermostat)}
+
+    def _calculate_update_rate(self):
+        if monotonic() < self._settle_until:
+            return ACTIVE_UPDATE_RATE
+
+        all_idle_on_schedule = True
+        for snapshot in self.data.values():
+            if not isinstance(snapshot, NexiaZoneSnapshot):
+                continue
+            if snapshot.is_calling:
+                return ACTIVE_UPDATE_RATE
+            if snapshot.is_in_permanent_hold:
+                all_idle_on_schedule = False
+
+        if all_idle_on_schedule:
+            return IDLE_UPDATE_RATE
+        return DEFAULT_UPDATE_RATE
+
+    @callback
+    def async_settle(self):
+        """Poll at the active rate while a command or scene takes effect."""
+        self._settle_until = monotonic() + COMMAND_SETTLE_TIME
+        if self.update_interval <= timedelta(seconds=ACTIVE_UPDATE_RATE):
+            return
+        self._async_set_update_interval(ACTIVE_UPDATE_RATE)
+        if self._listeners:
+            self._schedule_refresh()
+
+
+def _thermostat_snapshots(thermostat):
+    """Snapshot a thermostat and its zones."""
+    key = thermostat_key(thermostat.thermostat_id)
+    snapshots = {key: NexiaThermostatSnapshot.from_thermostat(thermostat)}
+    for zone in thermostat.zones:
+        snapshots[zone_key(zone.zone_id)] = NexiaZoneSnapshot.from_zone(zone)
+    return snapshots
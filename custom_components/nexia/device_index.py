@@ -0,0 +1,108 @@
+"""Index of the Nexia devices of a config entry, shared by all platforms."""
+from nexia.const import UNIT_CELSIUS
+
+from homeassistant.const import TEMP_CELSIUS, TEMP_FAHRENHEIT
+
+from .const import DOMAIN, MANUFACTURER
+from .coordinator import automation_key, thermostat_key, zone_key
+
+
+class NexiaThermostatInfo:
+    """A thermostat and what stays the same for the life of the entry."""
+
+    def __init__(self, thermostat, snapshot, coordinator):
+        """Initialize from a nexia thermostat and its first snapshot."""
+        self.thermostat = thermostat
+        self.coordinator = coordinator
+        self.thermostat_id = thermostat.thermostat_id
+        self.key = thermostat_key(self.thermostat_id)
+        self.name = snapshot.name
+        self.temperature_unit = (
+            TEMP_CELSIUS if snapshot.unit == UNIT_CELSIUS else TEMP_FAHRENHEIT
+        )
+        self.has_relative_humidity = snapshot.has_relative_humidity
+        self.has_emergency_heat = snapshot.has_emergency_heat
+        self.has_humidify_support = snapshot.has_humidify_support
+        self.has_dehumidify_support = snapshot.has_dehumidify_support
+        self.has_outdoor_temperature = snapshot.has_outdoor_temperature
+        self.has_variable_speed_compressor = snapshot.has_variable_speed_compressor
+        self.device_info = {
+            "identifiers": {(DOMAIN, self.thermostat_id)},
+            "name": snapshot.name,
+            "model": snapshot.model,
+            "sw_version": snapshot.firmware,
+            "manufacturer": MANUFACTURER,
+        }
+        self.zones = []
+
+
+class NexiaZoneInfo:
+    """A zone and what stays the same for the life of the entry."""
+
+    def __init__(self, zone, snapshot, thermostat_info):
+        """Initialize from a nexia zone and its first snapshot."""
+        self.zone = zone
+        self.zone_id = zone.zone_id
+        self.key = zone_key(self.zone_id)
+        self.name = snapshot.name
+        self.thermostat = thermostat_info
+        self.device_info = {
+            **thermostat_info.device_info,
+            "identifiers": {(DOMAIN, self.zone_id)},
+            "name": snapshot.name,
+            "via_device": (DOMAIN, thermostat_info.thermostat_id),
+        }
+
+
+class NexiaAutomationInfo:
+    """An automation and what stays the same for the life of the entry."""
+
+    def __init__(self, automation, snapshot):
+        """Initialize from a nexia automation and its first snapshot."""
+        self.automation = automation
+        self.automation_id = automation.automation_id
+        self.key = automation_key(self.automation_id)
+        self.name = snapshot.name
+
+
+class NexiaDeviceIndex:
+    """Every thermostat, zone and automation of a house, built once at setup.
+
+    The platforms create their entities from the index instead of each
+    walking the nexia objects and asking for capabilities again. Each
+    thermostat carries the coordinator its entities listen to.
+    """
+
+    def __init__(self, thermostats, automations):
+        """Initialize the index."""
+        self.thermostats = thermostats
+        self.zones = [zone for thermostat in thermostats for zone in thermostat.zones]
+        self.automations = automations
+
+    @classmethod
+    def from_coordinator(cls, coordinator):
+        """Build the index from the nexia objects and the current snapshots."""
+        nexia_home = coordinator.api.nexia_home
+        thermostats = []
+        for thermostat in nexia_home.thermostats:
+            thermostat_coordinator = coordinator.thermostat_coordinators[
+                thermostat.thermostat_id
+            ]
+            data = thermostat_coordinator.data
+            thermostat_info = NexiaThermostatInfo(
+                thermostat,
+                data[thermostat_key(thermostat.thermostat_id)],
+                thermostat_coordinator,
+            )
+            thermostat_info.zones = [
+                NexiaZoneInfo(zone, data[zone_key(zone.zone_id)], thermostat_info)
+                for zone in thermostat.zones
+            ]
+            thermostats.append(thermostat_info)
+        automations = [
+            NexiaAutomationInfo(
+                automation, coordinator.data[automation_key(automation.automation_id)]
+            )
+            for automation in nexia_home.automations
+        ]
+        return cls(thermostats, automations)
@@ -1,16 +1,11 @@
 """The nexia integration base entity."""
 
 from homeassistant.const import ATTR_ATTRIBUTION
-from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from homeassistant.core import callback
 from homeassistant.helpers.entity import Entity
 
-from .const import (
-    ATTRIBUTION,
-    DOMAIN,
-    MANUFACTURER,
-    SIGNAL_THERMOSTAT_UPDATE,
-    SIGNAL_ZONE_UPDATE,
-)
+from .const import ATTR_STALE, ATTRIBUTION
+from .signals import async_get_signal_aggregator
 
 
 class NexiaEntity(Entity):
@@ -22,11 +17,19 @@ class NexiaEntity(Entity):
         self._unique_id = unique_id
         self._name = name
         self._coordinator = coordinator
+        self._update_keys = set()
+        self._last_available = None
+        self._last_data_stale = None
+
+    @property
+    def coordinator(self):
+        """Return the coordinator the entity listens to."""
+        return self._coordinator
 
     @property
     def available(self):
         """Return True if entity is available."""
-        return self._coordinator.last_update_success
+        return self._coordinator.available
 
     @property
     def unique_id(self):
@@ -41,93 +44,137 @@ class NexiaEntity(Entity):
     @property
     def device_state_attributes(self):
         """Return the device specific state attributes."""
-        return {
+        data = {
             ATTR_ATTRIBUTION: ATTRIBUTION,
         }
+        # From the cache, or kept through failed polls
+        if self._coordinator.data_stale:
+            data[ATTR_STALE] = True
+        return data
 
     @property
     def should_poll(self):
         """Return False, updates are controlled via coordinator."""
         return False
 
+    @callback
+    def _async_handle_coordinator_update(self):
+        """Write state only if availability, staleness or our data changed."""
+        available = self.available
+        data_stale = self._coordinator.data_stale
+        changed = (
+            self._coordinator.has_changed(self._update_keys)
+            and self._async_update_state()
+        )
+        if (
+            available == self._last_available
+            and data_stale == self._last_data_stale
+            and not changed
+        ):
+            return
+        self._last_available = available
+        self._last_data_stale = data_stale
+        self.async_write_ha_state()
+
+    @callback
+    def _async_update_state(self):
+        """Take the data of the coordinator before the state is written.
+
+        Entities that show only part of what their change keys cover
+        return False when their part did not change.
+        """
+        return True
+
+    @callback
+    def _async_write_update(self):
+        """Take the data of the coordinator and write the state if it changed."""
+        if self._async_update_state():
+            self.async_write_ha_state()
+
     async def async_added_to_hass(self):
         """Subscribe to updates."""
-        self._coordinator.async_add_listener(self.async_write_ha_state)
+        # The state written when the entity is added is the baseline
+        self._async_update_state()
+        self._last_available = self.available
+        self._last_data_stale = self._coordinator.data_stale
+        self._coordinator.async_add_listener(self._async_handle_coordinator_update)
 
     async def async_will_remove_from_hass(self):
         """Undo subscription."""
-        self._coordinator.async_remove_listener(self.async_write_ha_state)
+        self._coordinator.async_remove_listener(self._async_handle_coordinator_update)
 
 
 class NexiaThermostatEntity(NexiaEntity):
     """Base class for nexia devices attached to a thermostat."""
 
-    def __init__(self, coordinator, thermostat, name, unique_id):
-        """Initialize the entity."""
-        super().__init__(coordinator, name, unique_id)
-        self._thermostat = thermostat
-        self._thermostat_update_subscription = None
+    def __init__(self, thermostat_info, name, unique_id):
+        """Initialize the entity, it listens to the thermostat's coordinator."""
+        super().__init__(thermostat_info.coordinator, name, unique_id)
+        self._thermostat_info = thermostat_info
+        self._thermostat = thermostat_info.thermostat
+        self._signal_subscription = None
+        self._thermostat_key = thermostat_info.key
+        self._update_keys.add(self._thermostat_key)
+
+    @property
+    def _thermostat_snapshot(self):
+        """Return the thermostat as of the last refresh or command."""
+        return self._coordinator.data[self._thermostat_key]
 
     @property
     def device_info(self):
         """Return the device_info of the device."""
-        return {
-            "identifiers": {(DOMAIN, self._thermostat.thermostat_id)},
-            "name": self._thermostat.get_name(),
-            "model": self._thermostat.get_model(),
-            "sw_version": self._thermostat.get_firmware(),
-            "manufacturer": MANUFACTURER,
-        }
+        return self._thermostat_info.device_info
+
+    async def async_update(self):
+        """Update the entity.
+
+        Only used by the generic entity update service.
+        """
+        await self._coordinator.async_request_refresh()
 
     async def async_added_to_hass(self):
-        """Listen for signals for services."""
+        """Listen for signals for services.
+
+        A command on the thermostat signals the thermostat key, one on a
+        zone the zone key.
+        """
         await super().async_added_to_hass()
-        self._thermostat_update_subscription = async_dispatcher_connect(
-            self.hass,
-            f"{SIGNAL_THERMOSTAT_UPDATE}-{self._thermostat.thermostat_id}",
-            self.async_write_ha_state,
-        )
+        self._signal_subscription = async_get_signal_aggregator(
+            self.hass
+        ).async_subscribe(self._update_keys, self._async_write_update)
 
     async def async_will_remove_from_hass(self):
         """Unsub from signals for services."""
         await super().async_will_remove_from_hass()
-        if self._thermostat_update_subscription:
-            self._thermostat_update_subscription()
+        if self._signal_subscription:
+            self._signal_subscription()
 
 
 class NexiaThermostatZoneEntity(NexiaThermostatEntity):
     """Base class for nexia devices attached to a thermostat."""
 
-    def __init__(self, coordinator, zone, name, unique_id):
+    def __init__(self, zone_info, name, unique_id):
         """Initialize the entity."""
-        super().__init__(coordinator, zone.thermostat, name, unique_id)
-        self._zone = zone
-        self._zone_update_subscription = None
+        super().__init__(zone_info.thermostat, name, unique_id)
+        self._zone_info = zone_info
+        self._zone = zone_info.zone
+        self._zone_key = zone_info.key
+        self._update_keys.add(self._zone_key)
+
+    @property
+    def _zone_snapshot(self):
+        """Return the zone as of the last refresh or command."""
+        return self._coordinator.data[self._zone_key]
 
     @property
     def device_info(self):
         """Return the device_info of the device."""
-        data = super().device_info
-        data.update(
-            {
-                "identifiers": {(DOMAIN, self._zone.zone_id)},
-                "name": self._zone.get_name(),
-                "via_device": (DOMAIN, self._zone.thermostat.thermostat_id),
-            }
-        )
-        return data
+        return self._zone_info.device_info
 
-    async def async_added_to_hass(self):
-        """Listen for signals for services."""
-        await super().async_added_to_hass()
-        self._zone_update_subscription = async_dispatcher_connect(
-            self.hass,
-            f"{SIGNAL_ZONE_UPDATE}-{self._zone.zone_id}",
-            self.async_write_ha_state,
-        )
+    async def async_update(self):
+        """Fetch just this zone.
 
-    async def async_will_remove_from_hass(self):
-        """Unsub from signals for services."""
-        await super().async_will_remove_from_hass()
-        if self._zone_update_subscription:
-            self._zone_update_subscription()
+        Only used by the generic entity update service.
+        """
+        await self._coordinator.async_refresh_zone(self._zone)
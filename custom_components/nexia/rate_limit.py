@@ -0,0 +1,157 @@
+"""Shape the requests an account makes to the Nexia cloud."""
+import asyncio
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+import logging
+import random
+from time import monotonic
+
+from homeassistant.core import callback
+
+from .const import (
+    API_BACKOFF_BASE,
+    API_BACKOFF_MAX,
+    API_BURST,
+    API_MAX_IN_FLIGHT,
+    API_RATE,
+    RATE_LIMITERS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NexiaRateLimiter:
+    """A token bucket with a priority lane and a shared backoff.
+
+    Every request takes a token. Tokens come back at API_RATE per second
+    up to API_BURST. Commands wait in the priority lane and get the next
+    token before any poll does, so a flood of polls never holds up what
+    a user asked for.
+
+    At most API_MAX_IN_FLIGHT requests are on the wire at once. When the
+    cloud hangs, further requests queue here instead of piling up open
+    connections, and a request cancelled while queued never goes out.
+    in_flight, queued and the stats counters of requests, timeouts,
+    backoffs and cancelled waiters show how the account is doing.
+
+    When the service throttles or fails, nothing is sent until the
+    backoff is over. The backoff doubles with every failure in a row, up
+    to API_BACKOFF_MAX, and is jittered so that several instances do not
+    come back at the same moment. A Retry-After from the service is
+    honoured instead.
+    """
+
+    def __init__(
+        self, hass, rate=API_RATE, burst=API_BURST, max_in_flight=API_MAX_IN_FLIGHT
+    ):
+        """Initialize the limiter."""
+        self._hass = hass
+        self._rate = rate
+        self._burst = burst
+        self._max_in_flight = max_in_flight
+        self._tokens = burst
+        self._refilled = monotonic()
+        self._lanes = {True: deque(), False: deque()}
+        self._wakeup = None
+        self._failures = 0
+        self._backoff_until = 0
+        self.in_flight = 0
+        self.stats = Counter()
+
+    @property
+    def queued(self):
+        """Return how many requests wait for their turn."""
+        return sum(
+            not future.done() for lane in self._lanes.values() for future in lane
+        )
+
+    @asynccontextmanager
+    async def async_slot(self, priority=False):
+        """Wait until a request may be sent and hold its place until done."""
+        future = self._hass.loop.create_future()
+        self._lanes[priority].append(future)
+        if self._wakeup is None:
+            self._async_dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            if future.done() and not future.cancelled():
+                # Let go of the place we were given just now
+                self._async_release()
+            raise
+        try:
+            yield
+        finally:
+            self._async_release()
+
+    @callback
+    def async_backoff(self, retry_after=None):
+        """Hold every request back after the service throttled or failed."""
+        self.stats["backoffs"] += 1
+        self._failures += 1
+        if retry_after is None:
+            delay = min(API_BACKOFF_MAX, API_BACKOFF_BASE * 2 ** (self._failures - 1))
+            delay = random.uniform(delay / 2, delay)
+        else:
+            delay = min(API_BACKOFF_MAX, retry_after)
+        _LOGGER.debug("Backing off Nexia requests for %.1f seconds", delay)
+        self._backoff_until = max(self._backoff_until, monotonic() + delay)
+
+    @callback
+    def async_success(self):
+        """Reset the backoff after the service answered."""
+        self._failures = 0
+
+    @callback
+    def _async_release(self):
+        self.in_flight -= 1
+        if self._wakeup is None:
+            self._async_dispatch()
+
+    @callback
+    def _async_dispatch(self):
+        """Hand out tokens to the waiters, commands first."""
+        self._wakeup = None
+        while self.in_flight < self._max_in_flight:
+            lane = self._next_lane()
+            if lane is None:
+                return
+            delay = self._delay()
+            if delay > 0:
+                self._wakeup = self._hass.loop.call_later(delay, self._async_dispatch)
+                return
+            self._tokens -= 1
+            self.in_flight += 1
+            self.stats["requests"] += 1
+            lane.popleft().set_result(None)
+        _LOGGER.debug(
+            "%s Nexia requests in flight, %s queued", self.in_flight, self.queued
+        )
+
+    def _next_lane(self):
+        for priority in (True, False):
+            lane = self._lanes[priority]
+            while lane and lane[0].done():
+                # Cancelled while waiting
+                lane.popleft()
+            if lane:
+                return lane
+        return None
+
+    def _delay(self):
+        now = monotonic()
+        self._tokens = min(
+            self._burst, self._tokens + (now - self._refilled) * self._rate
+        )
+        self._refilled = now
+        return max(self._backoff_until - now, (1 - self._tokens) / self._rate)
+
+
+@callback
+def async_get_rate_limiter(hass, username):
+    """Return the limiter every config entry of an account shares."""
+    rate_limiters = hass.data.setdefault(RATE_LIMITERS, {})
+    if username not in rate_limiters:
+        rate_limiters[username] = NexiaRateLimiter(hass)
+    return rate_limiters[username]
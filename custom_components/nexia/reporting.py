@@ -0,0 +1,87 @@
+"""Decide when a Nexia sensor value is worth a new state."""
+from time import monotonic
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+
+
+class NexiaSensorReporter:
+    """Hold sensor values back until they moved far and long enough.
+
+    A value is reported once it is delta or more away from the last
+    reported one, so a reading that flickers around a boundary does not
+    write a state every refresh. A value that moved far enough is
+    reported no sooner than min_interval seconds after the last one, and
+    is written when the interval is over. A value that settled less than
+    delta away is written max_interval seconds after the last report, so
+    the state never stays off for good; a max_interval of 0 never writes
+    it. Values that are not numbers, and the first value, are reported
+    right away.
+    """
+
+    def __init__(self, delta=0, min_interval=0, max_interval=0):
+        """Initialize the reporter."""
+        self._delta = delta
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._value = None
+        self._reported_at = None
+        self._unsub_write = None
+        self._write_at = None
+
+    @callback
+    def async_report(self, hass, value, write):
+        """Return the value to show, write is called for held back values."""
+        if self._should_report(value):
+            self.async_cancel()
+            self._value = value
+            self._reported_at = monotonic()
+            return value
+
+        wait = self._wait(value)
+        if wait is not None and (
+            self._unsub_write is None or monotonic() + wait < self._write_at
+        ):
+            self.async_cancel()
+
+            @callback
+            def async_write(_now):
+                self._unsub_write = None
+                write()
+
+            self._write_at = monotonic() + wait
+            self._unsub_write = async_call_later(hass, wait, async_write)
+        return self._value
+
+    @callback
+    def async_cancel(self):
+        """Drop a pending write."""
+        if self._unsub_write:
+            self._unsub_write()
+            self._unsub_write = None
+
+    def _should_report(self, value):
+        if not isinstance(value, (int, float)) or not isinstance(
+            self._value, (int, float)
+        ):
+            return True
+        elapsed = monotonic() - self._reported_at
+        if round(abs(value - self._value), 1) < self._delta:
+            return (
+                bool(self._max_interval)
+                and value != self._value
+                and elapsed >= self._max_interval
+            )
+        return elapsed >= self._min_interval
+
+    def _wait(self, value):
+        """Return the seconds until a held back value is due, None if never."""
+        if value == self._value:
+            return None
+        if round(abs(value - self._value), 1) >= self._delta:
+            interval = self._min_interval
+        elif self._max_interval:
+            interval = self._max_interval
+        else:
+            return None
+        return self._reported_at + interval - monotonic()
@@ -0,0 +1,200 @@
+"""Runtime and duty cycle of Nexia thermostats, accumulated refresh by refresh."""
+from time import time
+
+from homeassistant.core import callback
+import homeassistant.util.dt as dt_util
+
+from .const import (
+    RUNTIME_BUCKET_SECONDS,
+    RUNTIME_LONG_WINDOW,
+    RUNTIME_MAX_GAP,
+    RUNTIME_SAVE_DELAY,
+)
+from .signals import async_get_signal_aggregator
+
+RUNTIME_BLOWER = "blower"
+RUNTIME_EMERGENCY_HEAT = "emergency_heat"
+RUNTIME_COMPRESSOR = "compressor"
+RUNTIME_COMPRESSOR_SPEED = "compressor_speed"
+
+# How each source is read from a thermostat snapshot
+RUNTIME_SOURCES = {
+    RUNTIME_BLOWER: lambda snapshot: snapshot.is_blower_active,
+    RUNTIME_EMERGENCY_HEAT: lambda snapshot: snapshot.is_emergency_heat_active,
+    RUNTIME_COMPRESSOR: lambda snapshot: bool(snapshot.current_compressor_speed),
+    RUNTIME_COMPRESSOR_SPEED: lambda snapshot: snapshot.current_compressor_speed,
+}
+
+
+def runtime_key(thermostat_id):
+    """Return the signal key for the runtime of a thermostat."""
+    return f"runtime-{thermostat_id}"
+
+
+def runtime_sources(thermostat_info):
+    """Return the sources a thermostat has."""
+    sources = [RUNTIME_BLOWER]
+    if thermostat_info.has_emergency_heat:
+        sources.append(RUNTIME_EMERGENCY_HEAT)
+    if thermostat_info.has_variable_speed_compressor:
+        sources.extend((RUNTIME_COMPRESSOR, RUNTIME_COMPRESSOR_SPEED))
+    return sources
+
+
+def _start_of_day(timestamp):
+    """Return the timestamp of the local midnight before timestamp."""
+    return dt_util.as_timestamp(
+        dt_util.start_of_local_day(
+            dt_util.as_local(dt_util.utc_from_timestamp(timestamp))
+        )
+    )
+
+
+class NexiaRuntimeAccumulator:
+    """Integrate a value over time, one good refresh after the other.
+
+    The value seen at a refresh is taken to hold until the next one. The
+    integral is kept for the current day and in RUNTIME_BUCKET_SECONDS
+    buckets covering RUNTIME_LONG_WINDOW, together with how much time
+    each bucket saw. Averages over a window divide the two, so time that
+    was not seen does not count as off. Gaps longer than RUNTIME_MAX_GAP,
+    such as an outage or a restart, are not seen.
+    """
+
+    def __init__(self, data=None):
+        """Initialize the accumulator, from stored data if there is any."""
+        data = data or {}
+        self._value = data.get("value")
+        self._at = data.get("at")
+        self._day = data.get("day")
+        self._today = data.get("today", 0.0)
+        self._buckets = {
+            start: [integral, seen] for start, integral, seen in data.get("buckets", ())
+        }
+
+    def add(self, value, now):
+        """Count the time since the last value and remember the new one."""
+        if self._value is not None and 0 < now - self._at <= RUNTIME_MAX_GAP:
+            self._integrate(self._at, now, self._value)
+        self._value = None if value is None else float(value)
+        self._at = now
+        oldest = now - RUNTIME_LONG_WINDOW - RUNTIME_BUCKET_SECONDS
+        for start in [start for start in self._buckets if start < oldest]:
+            del self._buckets[start]
+
+    def today(self, now):
+        """Return the integral since local midnight."""
+        if self._day != _start_of_day(now):
+            return 0.0
+        return self._today
+
+    def average(self, window, now):
+        """Return the average over the last window seconds, None if unseen."""
+        integral = seen = 0
+        for start, (bucket_integral, bucket_seen) in self._buckets.items():
+            if start + RUNTIME_BUCKET_SECONDS > now - window:
+                integral += bucket_integral
+                seen += bucket_seen
+        if not seen:
+            return None
+        return integral / seen
+
+    def as_dict(self):
+        """Return the counters to store."""
+        return {
+            "value": self._value,
+            "at": self._at,
+            "day": self._day,
+            "today": round(self._today, 1),
+            "buckets": [
+                [start, round(integral, 1), round(seen, 1)]
+                for start, (integral, seen) in sorted(self._buckets.items())
+            ],
+        }
+
+    def _integrate(self, start, end, value):
+        day = _start_of_day(end)
+        if self._day != day:
+            self._day = day
+            self._today = 0.0
+        self._today += value * max(0, end - max(start, day))
+
+        while start < end:
+            bucket = int(start - start % RUNTIME_BUCKET_SECONDS)
+            stop = min(end, bucket + RUNTIME_BUCKET_SECONDS)
+            counters = self._buckets.setdefault(bucket, [0.0, 0.0])
+            counters[0] += value * (stop - start)
+            counters[1] += stop - start
+            start = stop
+
+
+class NexiaRuntimeTracker:
+    """Keep the runtime accumulators of every thermostat of a config entry.
+
+    The accumulators take the thermostat snapshot after every good
+    refresh, whether it changed or not, and the runtime sensors of the
+    thermostat are signalled to write their state. The counters are
+    written to storage every RUNTIME_SAVE_DELAY so a restart only loses
+    the time it was down.
+    """
+
+    def __init__(self, hass, store):
+        """Initialize the tracker."""
+        self._hass = hass
+        self._store = store
+        self._accumulators = {}
+        self._unsubs = []
+
+    async def async_load(self):
+        """Load the counters of the last run."""
+        data = await self._store.async_load() or {}
+        self._accumulators = {
+            thermostat_id: {
+                source: NexiaRuntimeAccumulator(counters)
+                for source, counters in sources.items()
+            }
+            for thermostat_id, sources in data.items()
+        }
+
+    def accumulator(self, thermostat_id, source):
+        """Return the accumulator of a thermostat's source."""
+        return self._accumulators[str(thermostat_id)][source]
+
+    @callback
+    def async_track(self, thermostat_info):
+        """Accumulate the sources of a thermostat after every good refresh."""
+        accumulators = self._accumulators.setdefault(
+            str(thermostat_info.thermostat_id), {}
+        )
+        sources = runtime_sources(thermostat_info)
+        for source in sources:
+            accumulators.setdefault(source, NexiaRuntimeAccumulator())
+        coordinator = thermostat_info.coordinator
+
+        @callback
+        def async_refreshed():
+            snapshot = coordinator.data[thermostat_info.key]
+            now = time()
+            for source in sources:
+                accumulators[source].add(RUNTIME_SOURCES[source](snapshot), now)
+            self._store.async_delay_save(self._data, RUNTIME_SAVE_DELAY)
+            async_get_signal_aggregator(self._hass).async_signal(
+                runtime_key(thermostat_info.thermostat_id)
+            )
+
+        self._unsubs.append(coordinator.async_add_refresh_listener(async_refreshed))
+
+    async def async_stop(self):
+        """Stop accumulating and store the counters."""
+        while self._unsubs:
+            self._unsubs.pop()()
+        await self._store.async_save(self._data())
+
+    def _data(self):
+        return {
+            thermostat_id: {
+                source: accumulator.as_dict()
+                for source, accumulator in accumulators.items()
+            }
+            for thermostat_id, accumulators in self._accumulators.items()
+        }
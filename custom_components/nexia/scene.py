@@ -1,46 +1,58 @@
 """Support for Nexia Automations."""
 
 from homeassistant.components.scene import Scene
-from homeassistant.helpers.event import async_call_later
 
-from .const import ATTR_DESCRIPTION, DOMAIN, NEXIA_DEVICE, UPDATE_COORDINATOR
+from .const import (
+    ATTR_DESCRIPTION,
+    DEVICE_INDEX,
+    DOMAIN,
+    NEXIA_API,
+    UPDATE_COORDINATOR,
+)
 from .entity import NexiaEntity
 
-SCENE_ACTIVATION_TIME = 5
-
 
 async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up automations for a Nexia device."""
 
     nexia_data = hass.data[DOMAIN][config_entry.entry_id]
-    nexia_home = nexia_data[NEXIA_DEVICE]
+    device_index = nexia_data[DEVICE_INDEX]
+    api = nexia_data[NEXIA_API]
     coordinator = nexia_data[UPDATE_COORDINATOR]
     entities = []
 
     # Automation switches
-    for automation_id in nexia_home.get_automation_ids():
-        automation = nexia_home.get_automation_by_id(automation_id)
-
-        entities.append(NexiaAutomationScene(coordinator, automation))
+    for automation in device_index.automations:
+        entities.append(NexiaAutomationScene(coordinator, automation, api))
 
-    async_add_entities(entities, True)
+    async_add_entities(entities)
 
 
 class NexiaAutomationScene(NexiaEntity, Scene):
     """Provides Nexia automation support."""
 
-    def __init__(self, coordinator, automation):
+    def __init__(self, coordinator, automation_info, api):
         """Initialize the automation scene."""
         super().__init__(
-            coordinator, name=automation.name, unique_id=automation.automation_id,
+            coordinator,
+            name=automation_info.name,
+            unique_id=automation_info.automation_id,
         )
-        self._automation = automation
+        self._automation = automation_info.automation
+        self._api = api
+        self._automation_key = automation_info.key
+        self._update_keys.add(self._automation_key)
+
+    @property
+    def _automation_snapshot(self):
+        """Return the automation as of the last refresh."""
+        return self._coordinator.data[self._automation_key]
 
     @property
     def device_state_attributes(self):
         """Return the scene specific state attributes."""
         data = super().device_state_attributes
-        data[ATTR_DESCRIPTION] = self._automation.description
+        data[ATTR_DESCRIPTION] = self._automation_snapshot.description
         return data
 
     @property
@@ -50,9 +62,5 @@ class NexiaAutomationScene(NexiaEntity, Scene):
 
     async def async_activate(self):
         """Activate an automation scene."""
-        await self.hass.async_add_executor_job(self._automation.activate)
-
-        async def refresh_callback(_):
-            await self._coordinator.async_refresh()
-
-        async_call_later(self.hass, SCENE_ACTIVATION_TIME, refresh_callback)
+        await self._api.async_activate(self._automation)
+        self._coordinator.async_verify_scene()
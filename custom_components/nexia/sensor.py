@@ -1,16 +1,45 @@
 """Support for Nexia / Trane XL Thermostats."""
-
-from nexia.const import UNIT_CELSIUS
+from time import time
 
 from homeassistant.const import (
     DEVICE_CLASS_HUMIDITY,
     DEVICE_CLASS_TEMPERATURE,
-    TEMP_CELSIUS,
-    TEMP_FAHRENHEIT,
+    TIME_MINUTES,
 )
+from homeassistant.core import callback
 
-from .const import DOMAIN, NEXIA_DEVICE, UPDATE_COORDINATOR
-from .entity import NexiaThermostatEntity, NexiaThermostatZoneEntity
+from .const import (
+    ATTR_AVERAGE_24H,
+    ATTR_DUTY_CYCLE_1H,
+    ATTR_DUTY_CYCLE_24H,
+    CONF_COMPRESSOR_SPEED_DELTA,
+    CONF_HUMIDITY_DELTA,
+    CONF_SENSOR_MAX_INTERVAL,
+    CONF_SENSOR_MIN_INTERVAL,
+    CONF_TEMPERATURE_DELTA,
+    DEFAULT_COMPRESSOR_SPEED_DELTA,
+    DEFAULT_HUMIDITY_DELTA,
+    DEFAULT_SENSOR_MAX_INTERVAL,
+    DEFAULT_SENSOR_MIN_INTERVAL,
+    DEFAULT_TEMPERATURE_DELTA,
+    DEVICE_INDEX,
+    DOMAIN,
+    NEXIA_API,
+    RUNTIME_LONG_WINDOW,
+    RUNTIME_SHORT_WINDOW,
+    RUNTIME_TRACKER,
+    UPDATE_COORDINATOR,
+)
+from .entity import NexiaEntity, NexiaThermostatEntity, NexiaThermostatZoneEntity
+from .reporting import NexiaSensorReporter
+from .runtime import (
+    RUNTIME_BLOWER,
+    RUNTIME_COMPRESSOR,
+    RUNTIME_COMPRESSOR_SPEED,
+    RUNTIME_EMERGENCY_HEAT,
+    runtime_key,
+)
+from .snapshot import snapshot_attr
 from .util import percent_conv
 
 
@@ -18,129 +47,158 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
     """Set up sensors for a Nexia device."""
 
     nexia_data = hass.data[DOMAIN][config_entry.entry_id]
-    nexia_home = nexia_data[NEXIA_DEVICE]
-    coordinator = nexia_data[UPDATE_COORDINATOR]
-    entities = []
+    device_index = nexia_data[DEVICE_INDEX]
+    runtime_tracker = nexia_data[RUNTIME_TRACKER]
+    options = config_entry.options
+    entities = [
+        NexiaApiSensor(
+            nexia_data[UPDATE_COORDINATOR], nexia_data[NEXIA_API], config_entry
+        )
+    ]
 
     # Thermostat / System Sensors
-    for thermostat_id in nexia_home.get_thermostat_ids():
-        thermostat = nexia_home.get_thermostat_by_id(thermostat_id)
-
+    for thermostat in device_index.thermostats:
         entities.append(
             NexiaThermostatSensor(
-                coordinator,
-                thermostat,
-                "get_system_status",
-                "System Status",
-                None,
-                None,
+                thermostat, "get_system_status", "System Status", None, None,
             )
         )
+        # Runtime
+        entities.append(
+            NexiaRuntimeSensor(
+                thermostat, runtime_tracker, RUNTIME_BLOWER, "Blower Runtime Today"
+            )
+        )
+        if thermostat.has_emergency_heat:
+            entities.append(
+                NexiaRuntimeSensor(
+                    thermostat,
+                    runtime_tracker,
+                    RUNTIME_EMERGENCY_HEAT,
+                    "Emergency Heat Runtime Today",
+                )
+            )
         # Air cleaner
         entities.append(
             NexiaThermostatSensor(
-                coordinator,
-                thermostat,
-                "get_air_cleaner_mode",
-                "Air Cleaner Mode",
-                None,
-                None,
+                thermostat, "get_air_cleaner_mode", "Air Cleaner Mode", None, None,
             )
         )
         # Compressor Speed
-        if thermostat.has_variable_speed_compressor():
+        if thermostat.has_variable_speed_compressor:
             entities.append(
                 NexiaThermostatSensor(
-                    coordinator,
                     thermostat,
                     "get_current_compressor_speed",
                     "Current Compressor Speed",
                     None,
                     "%",
                     percent_conv,
+                    _reporter(
+                        options,
+                        CONF_COMPRESSOR_SPEED_DELTA,
+                        DEFAULT_COMPRESSOR_SPEED_DELTA,
+                    ),
                 )
             )
             entities.append(
                 NexiaThermostatSensor(
-                    coordinator,
                     thermostat,
                     "get_requested_compressor_speed",
                     "Requested Compressor Speed",
                     None,
                     "%",
                     percent_conv,
+                    _reporter(
+                        options,
+                        CONF_COMPRESSOR_SPEED_DELTA,
+                        DEFAULT_COMPRESSOR_SPEED_DELTA,
+                    ),
                 )
             )
-        # Outdoor Temperature
-        if thermostat.has_outdoor_temperature():
-            unit = (
-                TEMP_CELSIUS
-                if thermostat.get_unit() == UNIT_CELSIUS
-                else TEMP_FAHRENHEIT
+            entities.append(
+                NexiaRuntimeSensor(
+                    thermostat,
+                    runtime_tracker,
+                    RUNTIME_COMPRESSOR,
+                    "Compressor Runtime Today",
+                )
             )
+            entities.append(
+                NexiaAverageSensor(
+                    thermostat,
+                    runtime_tracker,
+                    RUNTIME_COMPRESSOR_SPEED,
+                    "Average Compressor Speed",
+                )
+            )
+        # Outdoor Temperature
+        if thermostat.has_outdoor_temperature:
             entities.append(
                 NexiaThermostatSensor(
-                    coordinator,
                     thermostat,
                     "get_outdoor_temperature",
                     "Outdoor Temperature",
                     DEVICE_CLASS_TEMPERATURE,
-                    unit,
+                    thermostat.temperature_unit,
+                    reporter=_reporter(
+                        options, CONF_TEMPERATURE_DELTA, DEFAULT_TEMPERATURE_DELTA
+                    ),
                 )
             )
         # Relative Humidity
-        if thermostat.has_relative_humidity():
+        if thermostat.has_relative_humidity:
             entities.append(
                 NexiaThermostatSensor(
-                    coordinator,
                     thermostat,
                     "get_relative_humidity",
                     "Relative Humidity",
                     DEVICE_CLASS_HUMIDITY,
                     "%",
                     percent_conv,
+                    _reporter(options, CONF_HUMIDITY_DELTA, DEFAULT_HUMIDITY_DELTA),
                 )
             )
 
         # Zone Sensors
-        for zone_id in thermostat.get_zone_ids():
-            zone = thermostat.get_zone_by_id(zone_id)
-            unit = (
-                TEMP_CELSIUS
-                if thermostat.get_unit() == UNIT_CELSIUS
-                else TEMP_FAHRENHEIT
-            )
+        for zone in thermostat.zones:
             # Temperature
             entities.append(
                 NexiaThermostatZoneSensor(
-                    coordinator,
                     zone,
                     "get_temperature",
                     "Temperature",
                     DEVICE_CLASS_TEMPERATURE,
-                    unit,
+                    thermostat.temperature_unit,
                     None,
+                    _reporter(
+                        options, CONF_TEMPERATURE_DELTA, DEFAULT_TEMPERATURE_DELTA
+                    ),
                 )
             )
             # Zone Status
             entities.append(
                 NexiaThermostatZoneSensor(
-                    coordinator, zone, "get_status", "Zone Status", None, None,
+                    zone, "get_status", "Zone Status", None, None,
                 )
             )
             # Setpoint Status
             entities.append(
                 NexiaThermostatZoneSensor(
-                    coordinator,
-                    zone,
-                    "get_setpoint_status",
-                    "Zone Setpoint Status",
-                    None,
-                    None,
+                    zone, "get_setpoint_status", "Zone Setpoint Status", None, None,
                 )
             )
 
-    async_add_entities(entities, True)
+    async_add_entities(entities)
+
+
+def _reporter(options, conf_delta, default_delta):
+    """Return a reporter for a sensor type from the options of the entry."""
+    return NexiaSensorReporter(
+        options.get(conf_delta, default_delta),
+        options.get(CONF_SENSOR_MIN_INTERVAL, DEFAULT_SENSOR_MIN_INTERVAL),
+        options.get(CONF_SENSOR_MAX_INTERVAL, DEFAULT_SENSOR_MAX_INTERVAL),
+    )
 
 
 class NexiaThermostatSensor(NexiaThermostatEntity):
@@ -148,26 +206,27 @@ class NexiaThermostatSensor(NexiaThermostatEntity):
 
     def __init__(
         self,
-        coordinator,
         thermostat,
         sensor_call,
         sensor_name,
         sensor_class,
         sensor_unit,
         modifier=None,
+        reporter=None,
     ):
         """Initialize the sensor."""
         super().__init__(
-            coordinator,
             thermostat,
-            name=f"{thermostat.get_name()} {sensor_name}",
+            name=f"{thermostat.name} {sensor_name}",
             unique_id=f"{thermostat.thermostat_id}_{sensor_call}",
         )
         self._call = sensor_call
+        self._attr = snapshot_attr(sensor_call)
         self._class = sensor_class
         self._state = None
         self._unit_of_measurement = sensor_unit
         self._modifier = modifier
+        self._reporter = reporter
 
     @property
     def device_class(self):
@@ -177,45 +236,63 @@ class NexiaThermostatSensor(NexiaThermostatEntity):
     @property
     def state(self):
         """Return the state of the sensor."""
-        val = getattr(self._thermostat, self._call)()
+        return self._state
+
+    @callback
+    def _async_update_state(self):
+        """Take the value of the snapshot, as far as the reporter lets it.
+
+        Return False if the value shown did not change.
+        """
+        val = getattr(self._thermostat_snapshot, self._attr)
         if self._modifier:
             val = self._modifier(val)
         if isinstance(val, float):
             val = round(val, 1)
-        return val
+        if self._reporter:
+            val = self._reporter.async_report(self.hass, val, self._async_write_update)
+        previous, self._state = self._state, val
+        return val != previous
 
     @property
     def unit_of_measurement(self):
         """Return the unit of measurement this sensor expresses itself in."""
         return self._unit_of_measurement
 
+    async def async_will_remove_from_hass(self):
+        """Drop a held back state."""
+        await super().async_will_remove_from_hass()
+        if self._reporter:
+            self._reporter.async_cancel()
+
 
 class NexiaThermostatZoneSensor(NexiaThermostatZoneEntity):
     """Nexia Zone Sensor Support."""
 
     def __init__(
         self,
-        coordinator,
         zone,
         sensor_call,
         sensor_name,
         sensor_class,
         sensor_unit,
         modifier=None,
+        reporter=None,
     ):
         """Create a zone sensor."""
 
         super().__init__(
-            coordinator,
             zone,
-            name=f"{zone.get_name()} {sensor_name}",
+            name=f"{zone.name} {sensor_name}",
             unique_id=f"{zone.zone_id}_{sensor_call}",
         )
         self._call = sensor_call
+        self._attr = snapshot_attr(sensor_call)
         self._class = sensor_class
         self._state = None
         self._unit_of_measurement = sensor_unit
         self._modifier = modifier
+        self._reporter = reporter
 
     @property
     def device_class(self):
@@ -225,14 +302,193 @@ class NexiaThermostatZoneSensor(NexiaThermostatZoneEntity):
     @property
     def state(self):
         """Return the state of the sensor."""
-        val = getattr(self._zone, self._call)()
+        return self._state
+
+    @callback
+    def _async_update_state(self):
+        """Take the value of the snapshot, as far as the reporter lets it.
+
+        Return False if the value shown did not change.
+        """
+        val = getattr(self._zone_snapshot, self._attr)
         if self._modifier:
             val = self._modifier(val)
         if isinstance(val, float):
             val = round(val, 1)
-        return val
+        if self._reporter:
+            val = self._reporter.async_report(self.hass, val, self._async_write_update)
+        previous, self._state = self._state, val
+        return val != previous
 
     @property
     def unit_of_measurement(self):
         """Return the unit of measurement this sensor expresses itself in."""
         return self._unit_of_measurement
+
+    async def async_will_remove_from_hass(self):
+        """Drop a held back state."""
+        await super().async_will_remove_from_hass()
+        if self._reporter:
+            self._reporter.async_cancel()
+
+
+class NexiaRuntimeSensor(NexiaThermostatEntity):
+    """Minutes a thermostat source has been on today, and its duty cycle.
+
+    The counters are kept by the runtime tracker, which signals the
+    sensor after every good refresh of the thermostat.
+    """
+
+    def __init__(self, thermostat, runtime_tracker, source, sensor_name):
+        """Initialize the sensor."""
+        super().__init__(
+            thermostat,
+            name=f"{thermostat.name} {sensor_name}",
+            unique_id=f"{thermostat.thermostat_id}_{source}_runtime",
+        )
+        self._accumulator = runtime_tracker.accumulator(
+            thermostat.thermostat_id, source
+        )
+        self._update_keys.add(runtime_key(thermostat.thermostat_id))
+        self._shown = None
+
+    @property
+    def state(self):
+        """Return the minutes on today."""
+        return round(self._accumulator.today(time()) / 60, 1)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement this sensor expresses itself in."""
+        return TIME_MINUTES
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return "mdi:timer-outline"
+
+    @property
+    def device_state_attributes(self):
+        """Return the duty cycles over the rolling windows."""
+        data = super().device_state_attributes
+        now = time()
+        data[ATTR_DUTY_CYCLE_1H] = _percent(
+            self._accumulator.average(RUNTIME_SHORT_WINDOW, now)
+        )
+        data[ATTR_DUTY_CYCLE_24H] = _percent(
+            self._accumulator.average(RUNTIME_LONG_WINDOW, now)
+        )
+        return data
+
+    @callback
+    def _async_update_state(self):
+        """Return False if the figures shown did not change."""
+        previous = self._shown
+        self._shown = (self.state, self.device_state_attributes)
+        return self._shown != previous
+
+
+class NexiaAverageSensor(NexiaThermostatEntity):
+    """Time weighted average of a thermostat source over the last hour."""
+
+    def __init__(self, thermostat, runtime_tracker, source, sensor_name):
+        """Initialize the sensor."""
+        super().__init__(
+            thermostat,
+            name=f"{thermostat.name} {sensor_name}",
+            unique_id=f"{thermostat.thermostat_id}_{source}_average",
+        )
+        self._accumulator = runtime_tracker.accumulator(
+            thermostat.thermostat_id, source
+        )
+        self._update_keys.add(runtime_key(thermostat.thermostat_id))
+        self._shown = None
+
+    @property
+    def state(self):
+        """Return the average over the last hour."""
+        return _percent(self._accumulator.average(RUNTIME_SHORT_WINDOW, time()))
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement this sensor expresses itself in."""
+        return "%"
+
+    @property
+    def device_state_attributes(self):
+        """Return the average over the last day."""
+        data = super().device_state_attributes
+        data[ATTR_AVERAGE_24H] = _percent(
+            self._accumulator.average(RUNTIME_LONG_WINDOW, time())
+        )
+        return data
+
+    @callback
+    def _async_update_state(self):
+        """Return False if the figures shown did not change."""
+        previous = self._shown
+        self._shown = (self.state, self.device_state_attributes)
+        return self._shown != previous
+
+
+class NexiaApiSensor(NexiaEntity):
+    """Requests the account made to the Nexia cloud, and how they went.
+
+    The counters cover every config entry of the account. The state is
+    written after every good refresh of the house, not with each request,
+    so the sensor adds a state no more often than the house is polled.
+    """
+
+    def __init__(self, coordinator, api, config_entry):
+        """Initialize the sensor."""
+        super().__init__(
+            coordinator,
+            name=f"{config_entry.title} API Requests",
+            unique_id=f"{api.nexia_home.house_id}_api_requests",
+        )
+        self._api = api
+        self._remove_refresh_listener = None
+
+    @property
+    def available(self):
+        """Return True, the counters matter most while the cloud fails."""
+        return True
+
+    @property
+    def state(self):
+        """Return the requests that got an answer."""
+        return self._api.stats.get("requests", 0)
+
+    @property
+    def unit_of_measurement(self):
+        """Return the unit of measurement this sensor expresses itself in."""
+        return "requests"
+
+    @property
+    def icon(self):
+        """Return the icon."""
+        return "mdi:cloud-sync"
+
+    @property
+    def device_state_attributes(self):
+        """Return the other counters."""
+        data = super().device_state_attributes
+        data.update(self._api.stats)
+        data.pop("requests", None)
+        return data
+
+    async def async_added_to_hass(self):
+        """Write the counters after every good refresh of the house."""
+        await super().async_added_to_hass()
+        self._remove_refresh_listener = self._coordinator.async_add_refresh_listener(
+            self.async_write_ha_state
+        )
+
+    async def async_will_remove_from_hass(self):
+        """Stop writing the counters."""
+        await super().async_will_remove_from_hass()
+        self._remove_refresh_listener()
+
+
+def _percent(fraction):
+    return None if fraction is None else percent_conv(fraction)
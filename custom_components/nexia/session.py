@@ -0,0 +1,129 @@
+"""The HTTP session an account uses to talk to the Nexia cloud."""
+from collections import Counter
+import json
+import logging
+from time import monotonic
+
+import aiohttp
+from aiohttp import hdrs
+
+from homeassistant.const import EVENT_HOMEASSISTANT_CLOSE
+from homeassistant.core import callback
+from homeassistant.helpers.aiohttp_client import SERVER_SOFTWARE
+from homeassistant.util import ssl as ssl_util
+
+from .const import (
+    API_CONNECT_TIMEOUT,
+    API_KEEPALIVE_TIMEOUT,
+    API_MAX_IN_FLIGHT,
+    SESSIONS,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class NexiaClientSession:
+    """A pooled keep-alive session with compression and accounting.
+
+    The pool holds as many connections as the rate limiter lets requests
+    be in flight, and keeps them open for API_KEEPALIVE_TIMEOUT so polls
+    at the active rate do not pay for a new TLS handshake each time.
+    Responses are requested gzip or deflate compressed.
+
+    stats counts requests, new and reused connections, bytes sent and
+    received on the wire, bytes after decompression and the total
+    latency in milliseconds. Bytes received fall back to the decoded
+    size when the service sends no Content-Length.
+    """
+
+    def __init__(self):
+        """Initialize the session."""
+        self.stats = Counter()
+        # How many apis of the account use the session
+        self.users = 0
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(self._async_on_connection_create)
+        trace_config.on_connection_reuseconn.append(self._async_on_connection_reuse)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=API_MAX_IN_FLIGHT,
+                keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+                enable_cleanup_closed=True,
+                ssl=ssl_util.client_context(),
+            ),
+            headers={
+                hdrs.ACCEPT_ENCODING: "gzip, deflate",
+                hdrs.USER_AGENT: SERVER_SOFTWARE,
+            },
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=API_CONNECT_TIMEOUT),
+            trace_configs=[trace_config],
+        )
+
+    async def async_request(self, method, url, **kwargs):
+        """Send a request and read its body, return the response."""
+        start = monotonic()
+        response = await self._session.request(method, url, **kwargs)
+        body = await response.read()
+        latency = (monotonic() - start) * 1000
+
+        sent = len(json.dumps(kwargs["json"])) if kwargs.get("json") else 0
+        received = int(response.headers.get(hdrs.CONTENT_LENGTH, len(body)))
+        self.stats["requests"] += 1
+        self.stats["bytes_sent"] += sent
+        self.stats["bytes_received"] += received
+        self.stats["bytes_decoded"] += len(body)
+        self.stats["latency_ms"] += latency
+        _LOGGER.debug(
+            "%s %s: %s in %.0f ms, %s bytes sent, %s received, %s decoded",
+            method,
+            url,
+            response.status,
+            latency,
+            sent,
+            received,
+            len(body),
+        )
+        return response
+
+    async def async_close(self):
+        """Close the pooled connections."""
+        await self._session.close()
+
+    async def _async_on_connection_create(self, session, context, params):
+        self.stats["connections_created"] += 1
+
+    async def _async_on_connection_reuse(self, session, context, params):
+        self.stats["connections_reused"] += 1
+
+
+@callback
+def async_get_client_session(hass, username):
+    """Return the session every config entry and flow of an account shares.
+
+    Every caller has to give it back with async_release_client_session.
+    """
+    sessions = hass.data.get(SESSIONS)
+    if sessions is None:
+        sessions = hass.data[SESSIONS] = {}
+
+        async def async_close_sessions(_event):
+            for client_session in sessions.values():
+                await client_session.async_close()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_CLOSE, async_close_sessions)
+
+    if username not in sessions:
+        sessions[username] = NexiaClientSession()
+    client_session = sessions[username]
+    client_session.users += 1
+    return client_session
+
+
+async def async_release_client_session(hass, username):
+    """Give a session back, it is closed once the account no longer uses it."""
+    sessions = hass.data[SESSIONS]
+    client_session = sessions[username]
+    client_session.users -= 1
+    if not client_session.users:
+        del sessions[username]
+        await client_session.async_close()
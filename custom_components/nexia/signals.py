@@ -0,0 +1,67 @@
+"""Coalesce the update signals of Nexia thermostats and zones."""
+from homeassistant.core import callback
+
+from .const import SIGNAL_AGGREGATOR
+
+
+class NexiaSignalAggregator:
+    """Merge the update signals sent during one event loop iteration.
+
+    Entities subscribe with the change keys of the thermostat and zone
+    they show. A signal only marks its key pending. On the next
+    iteration every entity subscribed to a pending key is called once,
+    however many thermostat and zone signals reached it.
+    """
+
+    def __init__(self, hass):
+        """Initialize the aggregator."""
+        self._hass = hass
+        self._subscribers = {}
+        self._pending = set()
+        self._flush_scheduled = False
+
+    @callback
+    def async_subscribe(self, keys, target):
+        """Call target after any of the keys was signalled, return an unsubscribe."""
+        keys = list(keys)
+        for key in keys:
+            self._subscribers.setdefault(key, []).append(target)
+
+        @callback
+        def async_unsubscribe():
+            for key in keys:
+                subscribers = self._subscribers[key]
+                subscribers.remove(target)
+                if not subscribers:
+                    del self._subscribers[key]
+
+        return async_unsubscribe
+
+    @callback
+    def async_signal(self, *keys):
+        """Mark keys as updated."""
+        self._pending.update(keys)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._hass.loop.call_soon(self._async_flush)
+
+    @callback
+    def _async_flush(self):
+        self._flush_scheduled = False
+        pending, self._pending = self._pending, set()
+        # A dict keeps the order and calls every target once
+        targets = {}
+        for key in pending:
+            for target in self._subscribers.get(key, ()):
+                targets[target] = None
+        for target in targets:
+            target()
+
+
+@callback
+def async_get_signal_aggregator(hass):
+    """Return the aggregator shared by all Nexia entities."""
+    aggregator = hass.data.get(SIGNAL_AGGREGATOR)
+    if aggregator is None:
+        aggregator = hass.data[SIGNAL_AGGREGATOR] = NexiaSignalAggregator(hass)
+    return aggregator
@@ -0,0 +1,191 @@
+"""Immutable per-refresh snapshots of Nexia thermostats, zones and automations.
+
+Values are read from the nexia library once per refresh and stored under
+the name of the library getter they came from, without its get_ prefix.
+"""
+import math
+
+
+def snapshot_attr(call):
+    """Return the snapshot attribute holding the value of a library getter."""
+    if call.startswith("get_"):
+        return call[4:]
+    return call
+
+
+def _nan_to_none(value):
+    """NaN never compares equal, which would make every refresh a change."""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class _NexiaSnapshot:
+    """Base class for the snapshots."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        """Initialize the snapshot."""
+        for slot in self.__slots__:
+            object.__setattr__(self, slot, values[slot])
+
+    def __setattr__(self, name, value):
+        """Snapshots are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __eq__(self, other):
+        """Compare all values."""
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, slot) == getattr(other, slot) for slot in self.__slots__
+        )
+
+    def __hash__(self):
+        """Hash all values."""
+        return hash(tuple(getattr(self, slot) for slot in self.__slots__))
+
+    def __repr__(self):
+        """Return the representation."""
+        values = ", ".join(f"{slot}={getattr(self, slot)!r}" for slot in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+class NexiaThermostatSnapshot(_NexiaSnapshot):
+    """The state of a thermostat at one refresh."""
+
+    __slots__ = (
+        "thermostat_id",
+        "name",
+        "model",
+        "firmware",
+        "unit",
+        "deadband",
+        "setpoint_limits",
+        "humidity_setpoint_limits",
+        "has_relative_humidity",
+        "has_emergency_heat",
+        "has_humidify_support",
+        "has_dehumidify_support",
+        "has_outdoor_temperature",
+        "has_variable_speed_compressor",
+        "system_status",
+        "fan_mode",
+        "air_cleaner_mode",
+        "is_blower_active",
+        "is_emergency_heat_active",
+        "relative_humidity",
+        "dehumidify_setpoint",
+        "humidify_setpoint",
+        "outdoor_temperature",
+        "current_compressor_speed",
+        "requested_compressor_speed",
+    )
+
+    @classmethod
+    def from_thermostat(cls, thermostat):
+        """Read everything the entities need from a nexia thermostat."""
+        has_relative_humidity = thermostat.has_relative_humidity()
+        has_emergency_heat = thermostat.has_emergency_heat()
+        has_humidify_support = thermostat.has_humidify_support()
+        has_dehumidify_support = thermostat.has_dehumidify_support()
+        has_outdoor_temperature = bool(thermostat.has_outdoor_temperature())
+        return cls(
+            thermostat_id=thermostat.thermostat_id,
+            name=thermostat.get_name(),
+            model=thermostat.get_model(),
+            firmware=thermostat.get_firmware(),
+            unit=thermostat.get_unit(),
+            deadband=thermostat.get_deadband(),
+            setpoint_limits=tuple(thermostat.get_setpoint_limits()),
+            humidity_setpoint_limits=tuple(thermostat.get_humidity_setpoint_limits()),
+            has_relative_humidity=has_relative_humidity,
+            has_emergency_heat=has_emergency_heat,
+            has_humidify_support=has_humidify_support,
+            has_dehumidify_support=has_dehumidify_support,
+            has_outdoor_temperature=has_outdoor_temperature,
+            has_variable_speed_compressor=thermostat.has_variable_speed_compressor(),
+            system_status=thermostat.get_system_status(),
+            fan_mode=thermostat.get_fan_mode(),
+            air_cleaner_mode=thermostat.get_air_cleaner_mode(),
+            is_blower_active=thermostat.is_blower_active(),
+            is_emergency_heat_active=(
+                bool(thermostat.is_emergency_heat_active())
+                if has_emergency_heat
+                else False
+            ),
+            relative_humidity=(
+                thermostat.get_relative_humidity() if has_relative_humidity else None
+            ),
+            dehumidify_setpoint=(
+                thermostat.get_dehumidify_setpoint() if has_dehumidify_support else None
+            ),
+            humidify_setpoint=(
+                thermostat.get_humidify_setpoint() if has_humidify_support else None
+            ),
+            outdoor_temperature=(
+                _nan_to_none(thermostat.get_outdoor_temperature())
+                if has_outdoor_temperature
+                else None
+            ),
+            current_compressor_speed=thermostat.get_current_compressor_speed(),
+            requested_compressor_speed=thermostat.get_requested_compressor_speed(),
+        )
+
+
+class NexiaZoneSnapshot(_NexiaSnapshot):
+    """The state of a zone at one refresh."""
+
+    __slots__ = (
+        "zone_id",
+        "thermostat_id",
+        "name",
+        "temperature",
+        "cooling_setpoint",
+        "heating_setpoint",
+        "current_mode",
+        "requested_mode",
+        "preset",
+        "presets",
+        "status",
+        "setpoint_status",
+        "is_calling",
+        "is_in_permanent_hold",
+    )
+
+    @classmethod
+    def from_zone(cls, zone):
+        """Read everything the entities need from a nexia zone."""
+        return cls(
+            zone_id=zone.zone_id,
+            thermostat_id=zone.thermostat.thermostat_id,
+            name=zone.get_name(),
+            temperature=zone.get_temperature(),
+            cooling_setpoint=zone.get_cooling_setpoint(),
+            heating_setpoint=zone.get_heating_setpoint(),
+            current_mode=zone.get_current_mode(),
+            requested_mode=zone.get_requested_mode(),
+            preset=zone.get_preset(),
+            presets=tuple(zone.get_presets()),
+            status=zone.get_status(),
+            setpoint_status=zone.get_setpoint_status(),
+            is_calling=zone.is_calling(),
+            is_in_permanent_hold=zone.is_in_permanent_hold(),
+        )
+
+
+class NexiaAutomationSnapshot(_NexiaSnapshot):
+    """The state of an automation at one refresh."""
+
+    __slots__ = ("automation_id", "name", "description", "enabled")
+
+    @classmethod
+    def from_automation(cls, automation):
+        """Read everything the entities need from a nexia automation."""
+        return cls(
+            automation_id=automation.automation_id,
+            name=automation.name,
+            description=automation.description,
+            enabled=automation.enabled,
+        )
@@ -1,6 +1,12 @@
 """Utils for Nexia / Trane XL Thermostats."""
+import hashlib
 
 
 def percent_conv(val):
     """Convert an actual percentage (0.0-1.0) to 0-100 scale."""
     return round(val * 100.0, 1)
+
+
+def account_key(username):
+    """Return a key that tells accounts apart, without the username in it."""
+    return hashlib.sha256(username.encode()).hexdigest()
@@ -0,0 +1,330 @@
+"""Measure how the integration scales with the size of the house.
+
+For every house size a synthetic house is served by the fake Nexia
+server and the integration is set up in a bare Home Assistant instance.
+The benchmark records:
+
+- setup_seconds / setup_cpu_seconds: config entry setup until every
+  platform has added its entities.
+- poll_cpu_seconds: event loop CPU time of a refresh where nothing
+  changed, averaged over --polls refreshes.
+- state_writes_unchanged: entity state writes caused by such a refresh.
+- state_writes_changed: entity state writes caused by a refresh where
+  one zone per thermostat changed temperature.
+- memory_per_entity_bytes: memory allocated by setup, per entity.
+
+Results are printed as json. Given a --baseline file produced by an
+earlier run, every metric that got worse by more than --threshold is
+listed under "regressions" and the exit code is 1::
+
+    python script/benchmark.py --sizes 1,10,50,100 --output baseline.json
+    python script/benchmark.py --sizes 1,10,50,100 --baseline baseline.json
+
+This needs a Home Assistant install that matches the integration.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from fake_nexia_server import FakeNexiaServer
+from nexia_fixtures import build_house
+
+from homeassistant import config_entries, core
+from homeassistant.const import CONF_PASSWORD, CONF_URL, CONF_USERNAME
+from homeassistant.helpers.entity import Entity
+
+INTEGRATION_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "custom_components",
+    "nexia",
+)
+
+# Metrics that must not grow at all, the rest are timings and memory
+EXACT_METRICS = ("entities", "state_writes_unchanged", "state_writes_changed")
+TIMED_METRICS = (
+    "setup_seconds",
+    "setup_cpu_seconds",
+    "poll_cpu_seconds",
+    "memory_per_entity_bytes",
+)
+
+
+class ServerThread:
+    """Run the fake server on its own event loop and thread.
+
+    This keeps the server's CPU time out of the thread_time() figures
+    taken on the Home Assistant loop.
+    """
+
+    def __init__(self, server):
+        """Initialize the thread."""
+        self.server = server
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    def start(self):
+        """Start the server and return its url."""
+        self._thread.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.server.start(), self._loop
+        ).result()
+
+    def stop(self):
+        """Stop the server and its loop."""
+        asyncio.run_coroutine_threadsafe(self.server.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+class StateWriteCounter:
+    """Count calls to Entity.async_write_ha_state."""
+
+    def __init__(self):
+        """Initialize the counter."""
+        self.count = 0
+        self._original = None
+
+    def __enter__(self):
+        """Start counting."""
+        self._original = original = Entity.async_write_ha_state
+
+        def async_write_ha_state(entity):
+            self.count += 1
+            original(entity)
+
+        Entity.async_write_ha_state = async_write_ha_state
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop counting."""
+        Entity.async_write_ha_state = self._original
+
+
+async def async_start_hass(config_dir):
+    """Return a bare Home Assistant with config entries loaded."""
+    hass = core.HomeAssistant()
+    hass.config.config_dir = config_dir
+    hass.config.skip_pip = True
+    # Keep async_stop from stopping the loop we are running on
+    hass._stopped = asyncio.Event()  # pylint: disable=protected-access
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    return hass
+
+
+async def async_setup_entry(hass, url):
+    """Add a nexia config entry and wait until its entities exist."""
+    entry = config_entries.ConfigEntry(
+        1,
+        "nexia",
+        "Benchmark",
+        {CONF_USERNAME: "benchmark", CONF_PASSWORD: "benchmark", CONF_URL: url},
+        config_entries.SOURCE_USER,
+        config_entries.CONN_CLASS_CLOUD_POLL,
+        {},
+    )
+    await hass.config_entries.async_add(entry)
+    await hass.async_block_till_done()
+    if entry.state != config_entries.ENTRY_STATE_LOADED:
+        raise RuntimeError(f"Setup failed: {entry.state}")
+    return entry
+
+
+def touch_zones(server):
+    """Change the temperature of the first zone of every thermostat."""
+    for thermostat in server.thermostats:
+        zone = thermostat["zones"][0]
+        zone["temperature"] = 62 + (zone["temperature"] - 61) % 20
+
+
+async def async_measure(config_dir, house, polls):
+    """Return timings and state writes for one house."""
+    server_thread = ServerThread(FakeNexiaServer(house=house))
+    url = server_thread.start()
+    hass = await async_start_hass(config_dir)
+    try:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        entry = await async_setup_entry(hass, url)
+        setup_cpu_seconds = time.thread_time() - cpu
+        setup_seconds = time.perf_counter() - wall
+
+        coordinator = hass.data["nexia"][entry.entry_id]["update_coordinator"]
+
+        with StateWriteCounter() as writes:
+            cpu = time.thread_time()
+            for _ in range(polls):
+                await coordinator.async_refresh()
+                await hass.async_block_till_done()
+            poll_cpu_seconds = (time.thread_time() - cpu) / polls
+            state_writes_unchanged = writes.count / polls
+
+        touch_zones(server_thread.server)
+        with StateWriteCounter() as writes:
+            await coordinator.async_refresh()
+            await hass.async_block_till_done()
+            state_writes_changed = writes.count
+
+        return {
+            "entities": len(hass.states.async_all()),
+            "setup_seconds": setup_seconds,
+            "setup_cpu_seconds": setup_cpu_seconds,
+            "poll_cpu_seconds": poll_cpu_seconds,
+            "state_writes_unchanged": state_writes_unchanged,
+            "state_writes_changed": state_writes_changed,
+        }
+    finally:
+        await hass.async_stop(force=True)
+        server_thread.stop()
+
+
+async def async_measure_memory(config_dir, house):
+    """Return the memory allocated by setting up one house, per entity."""
+    server_thread = ServerThread(FakeNexiaServer(house=house))
+    url = server_thread.start()
+    hass = await async_start_hass(config_dir)
+    try:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        await async_setup_entry(hass, url)
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        return allocated / len(hass.states.async_all())
+    finally:
+        await hass.async_stop(force=True)
+        server_thread.stop()
+
+
+def make_config_dir(root, name):
+    """Create a config dir that loads the integration from this checkout."""
+    config_dir = os.path.join(root, name)
+    os.makedirs(os.path.join(config_dir, "custom_components"))
+    os.symlink(INTEGRATION_DIR, os.path.join(config_dir, "custom_components", "nexia"))
+    return config_dir
+
+
+async def async_run(args):
+    """Run the benchmark for every size."""
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as root:
+        # The api keeps its device uuid in the working directory
+        os.chdir(root)
+        try:
+            for thermostat_count in args.sizes:
+                house = build_house(
+                    thermostat_count=thermostat_count,
+                    zones_per_thermostat=args.zones,
+                    automation_count=args.automations,
+                    seed=args.seed,
+                )
+                result = {
+                    "thermostats": thermostat_count,
+                    "zones": thermostat_count * args.zones,
+                    "automations": args.automations,
+                }
+                result.update(
+                    await async_measure(
+                        make_config_dir(root, f"{thermostat_count}-timing"),
+                        house,
+                        args.polls,
+                    )
+                )
+                result["memory_per_entity_bytes"] = await async_measure_memory(
+                    make_config_dir(root, f"{thermostat_count}-memory"), house
+                )
+                print(
+                    f"{thermostat_count} thermostats: {result['entities']} entities, "
+                    f"setup {result['setup_seconds']:.3f}s, "
+                    f"poll {result['poll_cpu_seconds'] * 1000:.2f}ms cpu",
+                    file=sys.stderr,
+                )
+                results.append(result)
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """Compare results with a baseline run of the same sizes."""
+    baseline_by_size = {result["thermostats"]: result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_size.get(result["thermostats"])
+        if previous is None:
+            continue
+        for metric in EXACT_METRICS + TIMED_METRICS:
+            if metric not in previous:
+                continue
+            limit = previous[metric]
+            if metric in TIMED_METRICS:
+                limit *= 1 + threshold
+            if result[metric] > limit:
+                regressions.append(
+                    {
+                        "thermostats": result["thermostats"],
+                        "metric": metric,
+                        "baseline": previous[metric],
+                        "current": result[metric],
+                    }
+                )
+    return regressions
+
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default="1,10,50,100",
+        type=lambda value: [int(size) for size in value.split(",")],
+        help="comma separated thermostat counts",
+    )
+    parser.add_argument("--zones", type=int, default=4, help="zones per thermostat")
+    parser.add_argument("--automations", type=int, default=10)
+    parser.add_argument("--polls", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the json to this file")
+    parser.add_argument("--baseline", help="json from an earlier run to compare to")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="allowed relative growth of timings and memory",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(async_run(args))
+
+    report = {
+        "python": platform.python_version(),
+        "zones_per_thermostat": args.zones,
+        "polls": args.polls,
+        "seed": args.seed,
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        report["regressions"] = find_regressions(results, baseline, args.threshold)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
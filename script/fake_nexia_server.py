@@ -0,0 +1,360 @@
+"""A local stand-in for the Nexia mobile API.
+
+Serves the sign in, session, house, thermostat, zone and command
+endpoints the integration uses from an in-memory house, with
+configurable latency and error injection, so setup, polling and
+commands can be exercised without network access.
+
+Run it and point the integration at it with the ``url`` option::
+
+    python script/fake_nexia_server.py --port 8585 --latency 0.2
+
+    nexia:
+      username: test@example.com
+      password: secret
+      url: http://127.0.0.1:8585
+
+The behaviour can be changed while running by posting json to
+``/_fake/config``, and request counts are available from ``/_fake/stats``.
+"""
+import argparse
+import asyncio
+from collections import Counter
+import hashlib
+import json
+import logging
+import random
+
+from aiohttp import web
+
+from nexia_fixtures import build_house
+
+_LOGGER = logging.getLogger(__name__)
+
+MOBILE_ID = 555
+API_KEY = "fake-api-key"
+
+LOGIN_URL = "https://www.mynexia.com/login"
+UNAUTHENTICATED_PATHS = ("/mobile/accounts/sign_in",)
+
+ZONE_FEATURES = {"zone_mode": "thermostat_mode"}
+
+
+class FakeNexiaServer:
+    """In-memory Nexia mobile API."""
+
+    def __init__(
+        self,
+        house=None,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        error_status=500,
+        seed=None,
+        etag=True,
+        retry_after=None,
+    ):
+        """Initialize the server.
+
+        With etag the GET endpoints send an ETag and answer a matching
+        If-None-Match with 304, like the real service. Injected errors
+        carry a Retry-After of retry_after seconds when it is set.
+        """
+        self.house = house or build_house()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.etag = etag
+        self.retry_after = retry_after
+        # List of [status, count, path prefix] to fail before anything else
+        self.fail_next = []
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._runner = None
+        self.root_url = None
+
+    @property
+    def house_id(self):
+        """Return the id of the house."""
+        return self.house["result"]["id"]
+
+    def _children(self, index):
+        return self.house["result"]["_links"]["child"][index]["data"]["items"]
+
+    @property
+    def thermostats(self):
+        """Return the thermostat payloads."""
+        return self._children(0)
+
+    @property
+    def automations(self):
+        """Return the automation payloads."""
+        return self._children(1)
+
+    def _find(self, items, item_id):
+        for item in items:
+            if item["id"] == item_id:
+                return item
+        raise web.HTTPNotFound()
+
+    def _find_zone(self, zone_id):
+        for thermostat in self.thermostats:
+            for zone in thermostat["zones"]:
+                if zone["id"] == zone_id:
+                    return zone
+        raise web.HTTPNotFound()
+
+    def make_app(self):
+        """Create the aiohttp application."""
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes(
+            [
+                web.post("/mobile/accounts/sign_in", self._sign_in),
+                web.post("/mobile/session", self._session),
+                web.get("/mobile/houses/{house_id}", self._get_house),
+                web.get(
+                    "/mobile/xxl_thermostats/{thermostat_id}", self._get_thermostat
+                ),
+                web.get("/mobile/xxl_zones/{zone_id}", self._get_zone),
+                web.post(
+                    "/mobile/xxl_thermostats/{thermostat_id}/{end_point}",
+                    self._thermostat_command,
+                ),
+                web.post("/mobile/xxl_zones/{zone_id}/{end_point}", self._zone_command),
+                web.post(
+                    "/mobile/automations/{automation_id}/{end_point}",
+                    self._automation_command,
+                ),
+                web.post("/_fake/config", self._set_config),
+                web.get("/_fake/stats", self._get_stats),
+            ]
+        )
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving, port 0 picks a free port."""
+        self._runner = web.AppRunner(self.make_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        # pylint: disable=protected-access
+        port = site._server.sockets[0].getsockname()[1]
+        self.root_url = f"http://{host}:{port}"
+        return self.root_url
+
+    async def stop(self):
+        """Stop serving."""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        if request.path.startswith("/_fake/"):
+            return await handler(request)
+
+        self.stats[f"{request.method} {request.path}"] += 1
+        self.stats["requests"] += 1
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        status = self._injected_status(request.path)
+        if status:
+            self.stats["injected_errors"] += 1
+            headers = {}
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            return web.json_response(
+                {"success": False, "error": "Injected error"},
+                status=status,
+                headers=headers,
+            )
+
+        if (
+            request.path not in UNAUTHENTICATED_PATHS
+            and request.headers.get("X-ApiKey") != API_KEY
+        ):
+            # The real service redirects to the login page
+            return web.Response(status=302, headers={"Location": LOGIN_URL})
+
+        response = await handler(request)
+        if response.body:
+            # Compressed if the client accepts it, like the real service
+            response.enable_compression()
+        return response
+
+    def _injected_status(self, path):
+        for failure in self.fail_next:
+            status, count, prefix = failure
+            if count > 0 and path.startswith(prefix):
+                failure[1] -= 1
+                return status
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error_status
+        return None
+
+    @staticmethod
+    async def _payload(request):
+        if not request.can_read_body:
+            return {}
+        try:
+            return await request.json()
+        except ValueError:
+            return dict(await request.post())
+
+    async def _sign_in(self, request):
+        payload = await self._payload(request)
+        if not payload.get("login") or not payload.get("password"):
+            return web.json_response({"success": False, "error": "Invalid login"})
+        return web.json_response(
+            {"success": True, "result": {"mobile_id": MOBILE_ID, "api_key": API_KEY}}
+        )
+
+    async def _session(self, request):
+        return web.json_response(
+            {
+                "success": True,
+                "result": {
+                    "_links": {
+                        "child": [
+                            {
+                                "data": {
+                                    "id": self.house_id,
+                                    "name": self.house["result"]["name"],
+                                }
+                            }
+                        ]
+                    }
+                },
+            }
+        )
+
+    async def _get_house(self, request):
+        if int(request.match_info["house_id"]) != self.house_id:
+            raise web.HTTPNotFound()
+        return self._conditional_response(request, self.house)
+
+    async def _get_thermostat(self, request):
+        thermostat = self._find(
+            self.thermostats, int(request.match_info["thermostat_id"])
+        )
+        return self._conditional_response(
+            request, {"success": True, "result": thermostat}
+        )
+
+    async def _get_zone(self, request):
+        zone = self._find_zone(int(request.match_info["zone_id"]))
+        return self._conditional_response(request, {"success": True, "result": zone})
+
+    def _conditional_response(self, request, data):
+        body = json.dumps(data)
+        if not self.etag:
+            return web.json_response(text=body)
+        etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(text=body, headers={"ETag": etag})
+
+    async def _thermostat_command(self, request):
+        thermostat = self._find(
+            self.thermostats, int(request.match_info["thermostat_id"])
+        )
+        end_point = request.match_info["end_point"]
+        payload = await self._payload(request)
+        self._set_setting(thermostat["settings"], end_point, payload.get("value"))
+        return web.json_response({"success": True, "result": thermostat})
+
+    async def _zone_command(self, request):
+        zone = self._find_zone(int(request.match_info["zone_id"]))
+        end_point = request.match_info["end_point"]
+        payload = await self._payload(request)
+
+        if end_point == "setpoints":
+            zone["setpoints"] = {"heat": payload["heat"], "cool": payload["cool"]}
+        elif end_point == "return_to_schedule":
+            self._set_setting(zone["settings"], "run_mode", "run_schedule")
+        else:
+            value = payload.get("value")
+            self._set_setting(zone["settings"], end_point, value)
+            if end_point in ZONE_FEATURES:
+                for feature in zone["features"]:
+                    if feature["name"] == ZONE_FEATURES[end_point]:
+                        feature["value"] = value
+        return web.json_response({"success": True, "result": zone})
+
+    async def _automation_command(self, request):
+        self._find(self.automations, int(request.match_info["automation_id"]))
+        return web.json_response({"success": True, "result": {}})
+
+    @staticmethod
+    def _set_setting(settings, setting_type, value):
+        for setting in settings:
+            if setting["type"] == setting_type:
+                setting["current_value"] = value
+                return
+        settings.append({"type": setting_type, "current_value": value})
+
+    async def _set_config(self, request):
+        """Change latency and error injection while running."""
+        config = await request.json()
+        for key in (
+            "latency",
+            "jitter",
+            "error_rate",
+            "error_status",
+            "etag",
+            "retry_after",
+        ):
+            if key in config:
+                setattr(self, key, config[key])
+        for failure in config.get("fail_next", []):
+            self.fail_next.append(
+                [failure["status"], failure.get("count", 1), failure.get("path", "/")]
+            )
+        return web.json_response({"success": True})
+
+    async def _get_stats(self, request):
+        return web.json_response(dict(self.stats))
+
+
+def main():
+    """Run the fake server from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8585)
+    parser.add_argument("--thermostats", type=int, default=2)
+    parser.add_argument("--zones", type=int, default=2)
+    parser.add_argument("--automations", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--retry-after", type=int)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--no-etag", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = FakeNexiaServer(
+        house=build_house(
+            thermostat_count=args.thermostats,
+            zones_per_thermostat=args.zones,
+            automation_count=args.automations,
+            seed=args.seed,
+        ),
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+        etag=not args.no_etag,
+        retry_after=args.retry_after,
+    )
+    web.run_app(server.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
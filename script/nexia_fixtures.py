@@ -0,0 +1,165 @@
+"""Build Nexia mobile API payloads for the fake server and benchmarks.
+
+The payloads carry every key the nexia library and the integration
+read, and nothing else.
+"""
+import random
+
+FIRST_THERMOSTAT_ID = 2000000
+FIRST_ZONE_ID = 3000000
+FIRST_AUTOMATION_ID = 4000000
+
+PRESETS = ["None", "Home", "Away", "Sleep"]
+RUN_MODE_OPTIONS = [
+    {"value": "permanent_hold", "label": "Permanent Hold"},
+    {"value": "run_schedule", "label": "Run Schedule"},
+]
+
+
+MODES = ["AUTO", "COOL", "HEAT", "OFF"]
+ZONE_STATUSES = ["", "", "", "Heating", "Cooling"]
+
+
+def zone_json(
+    zone_id, name, temperature=72, heat=68, cool=76, mode="AUTO", zone_status=""
+):
+    """Return the json for a zone."""
+    return {
+        "id": zone_id,
+        "name": name,
+        "temperature": temperature,
+        "setpoints": {"heat": heat, "cool": cool},
+        "zone_status": zone_status,
+        "operating_state": zone_status,
+        "features": [{"name": "thermostat_mode", "value": mode}],
+        "settings": [
+            {"type": "zone_mode", "current_value": mode},
+            {
+                "type": "preset_selected",
+                "current_value": 0,
+                "labels": list(PRESETS),
+                "options": [
+                    {"value": value, "label": label}
+                    for value, label in enumerate(PRESETS)
+                ],
+            },
+            {
+                "type": "run_mode",
+                "current_value": "run_schedule",
+                "options": list(RUN_MODE_OPTIONS),
+            },
+        ],
+    }
+
+
+def thermostat_json(thermostat_id, name, zones, unit="F"):
+    """Return the json for a thermostat with the given zones."""
+    return {
+        "id": thermostat_id,
+        "type": "xxl_thermostat",
+        "name": name,
+        "system_status": "System Idle",
+        "has_outdoor_temperature": True,
+        "outdoor_temperature": "85",
+        "indoor_humidity": "45",
+        "zones": zones,
+        "features": [
+            {
+                "name": "advanced_info",
+                "items": [
+                    {"label": "Model", "value": "XL1050"},
+                    {"label": "Firmware Version", "value": "5.9.1"},
+                ],
+            },
+            {
+                "name": "thermostat",
+                "scale": unit.lower(),
+                "setpoint_delta": 3,
+                "setpoint_heat_min": 55,
+                "setpoint_cool_max": 99,
+            },
+            {"name": "thermostat_compressor_speed", "compressor_speed": 0.0},
+        ],
+        "settings": [
+            {"type": "fan_mode", "current_value": "auto"},
+            {"type": "air_cleaner_mode", "current_value": "auto"},
+            {"type": "dehumidify", "current_value": 0.5},
+        ],
+    }
+
+
+def automation_json(automation_id, name):
+    """Return the json for an automation."""
+    return {
+        "id": automation_id,
+        "name": name,
+        "description": f"Runs {name}",
+        "enabled": True,
+    }
+
+
+def house_json(house_id, name, thermostats, automations):
+    """Return the json of the houses endpoint."""
+    return {
+        "success": True,
+        "result": {
+            "id": house_id,
+            "name": name,
+            "_links": {
+                "child": [
+                    {"data": {"items": thermostats}},
+                    {"data": {"items": automations}},
+                ]
+            },
+        },
+    }
+
+
+def random_zone_values(rng):
+    """Return zone_json keyword arguments for a plausible random zone."""
+    heat = rng.randint(60, 70)
+    return {
+        "temperature": rng.randint(62, 80),
+        "heat": heat,
+        "cool": heat + rng.randint(4, 10),
+        "mode": rng.choice(MODES),
+        "zone_status": rng.choice(ZONE_STATUSES),
+    }
+
+
+def build_house(
+    house_id=123456,
+    thermostat_count=2,
+    zones_per_thermostat=2,
+    automation_count=2,
+    seed=None,
+):
+    """Build a house with the given number of devices.
+
+    Without a seed every zone is identical, with one the temperatures,
+    setpoints, modes and zone statuses vary reproducibly, which suits
+    large synthetic houses.
+    """
+    rng = random.Random(seed) if seed is not None else None
+    thermostats = []
+    zone_id = FIRST_ZONE_ID
+    for thermostat_index in range(thermostat_count):
+        zones = []
+        for zone_index in range(zones_per_thermostat):
+            values = random_zone_values(rng) if rng else {}
+            zones.append(
+                zone_json(zone_id, f"Zone {thermostat_index}-{zone_index}", **values)
+            )
+            zone_id += 1
+        thermostats.append(
+            thermostat_json(
+                FIRST_THERMOSTAT_ID + thermostat_index,
+                f"Thermostat {thermostat_index}",
+                zones,
+            )
+        )
+    automations = [
+        automation_json(FIRST_AUTOMATION_ID + index, f"Automation {index}")
+        for index in range(automation_count)
+    ]
+    return house_json(house_id, "Fake House", thermostats, automations)